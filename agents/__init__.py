@@ -1,12 +1,11 @@
 """
 Agents package for the Obesity Treatment Multi-Agent System
+
+Submodules are imported lazily (PEP 562): the crewai / langchain_openai
+import cost is only paid when an agent factory is first used.
 """
 
-from .data_analyst_agent import create_data_analyst_agent
-from .dietician_agent import create_dietician_agent
-from .medical_advisor_agent import create_medical_advisor_agent
-from .fitness_trainer_agent import create_fitness_trainer_agent
-from .care_coordinator_agent import create_care_coordinator_agent
+import importlib
 
 __all__ = [
     'create_data_analyst_agent',
@@ -15,3 +14,23 @@ __all__ = [
     'create_fitness_trainer_agent',
     'create_care_coordinator_agent'
 ]
+
+_FACTORY_MODULES = {
+    'create_data_analyst_agent': '.data_analyst_agent',
+    'create_dietician_agent': '.dietician_agent',
+    'create_medical_advisor_agent': '.medical_advisor_agent',
+    'create_fitness_trainer_agent': '.fitness_trainer_agent',
+    'create_care_coordinator_agent': '.care_coordinator_agent',
+}
+
+
+def __getattr__(name):
+    """Lazily import the submodule providing the requested factory"""
+    try:
+        module_name = _FACTORY_MODULES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(module_name, __name__)
+    factory = getattr(module, name)
+    globals()[name] = factory  # cache for subsequent lookups
+    return factory
@@ -0,0 +1,133 @@
+"""
+Shared agent factory
+Builds any of the five agents from the cached agents.yaml config,
+replacing the five copy-pasted create_*_agent bodies
+"""
+
+import asyncio
+import atexit
+import functools
+import os
+
+from ._config import get_agent_config
+
+# crewai and langchain_openai are imported inside the factory functions:
+# both are heavy (pydantic, litellm, ...) and would otherwise be paid at
+# package import even when no agent is ever built.
+
+# LLM settings are snapshotted once at import instead of hitting os.environ
+# on every agent build. Changing these env vars requires a process restart.
+_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+_TEMPERATURE = float(os.getenv("OPENAI_TEMPERATURE", "0.7"))
+
+# The coordination step is synthesis/formatting, not clinical reasoning,
+# so it runs on a cheaper deterministic model than the specialists.
+_COORDINATOR_MODEL = os.getenv("OPENAI_COORDINATOR_MODEL", "gpt-4o-mini")
+
+
+@functools.lru_cache(maxsize=1)
+def _http_clients():
+    """
+    Build the process-wide pooled HTTP client pair (sync, async)
+
+    One pool serves every LLM call, so the fan-out over specialist tasks
+    multiplexes over warm keep-alive connections instead of paying a TLS
+    handshake per call. HTTP/2 is enabled when the optional h2 package
+    is installed; both clients are closed at interpreter exit.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=32, max_keepalive_connections=16)
+    try:
+        sync_client = httpx.Client(limits=limits, http2=True)
+        async_client = httpx.AsyncClient(limits=limits, http2=True)
+    except ImportError:
+        # h2 not installed; HTTP/1.1 keep-alive pooling still applies
+        sync_client = httpx.Client(limits=limits)
+        async_client = httpx.AsyncClient(limits=limits)
+
+    def _close():
+        sync_client.close()
+        try:
+            asyncio.run(async_client.aclose())
+        except RuntimeError:
+            # Event loop already running/closed during shutdown
+            pass
+
+    atexit.register(_close)
+    return sync_client, async_client
+
+
+@functools.lru_cache(maxsize=1)
+def get_default_llm():
+    """
+    Build the default LLM once and share it across all five agents
+
+    A single instance means one httpx connection pool and one tiktoken
+    encoder instead of five: fewer TLS handshakes and lower memory when
+    the crew is constructed. Both the sync client (used by CrewAI's
+    synchronous task execution) and the async client (used by langchain's
+    agenerate path) come from the shared pool, so concurrent specialist
+    calls reuse keep-alive connections whichever way they are driven.
+    """
+    from langchain_openai import ChatOpenAI
+
+    sync_client, async_client = _http_clients()
+    return ChatOpenAI(
+        model=_MODEL,
+        temperature=_TEMPERATURE,
+        http_client=sync_client,
+        http_async_client=async_client
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_coordinator_llm():
+    """
+    Build the LLM used by the Care Coordinator
+
+    Coordination merges the specialist reports into one document; a
+    cheaper model at temperature 0 does that faster and for a fraction
+    of the cost without touching the specialist tier. Override with
+    OPENAI_COORDINATOR_MODEL; shares the pooled HTTP clients.
+    """
+    from langchain_openai import ChatOpenAI
+
+    if _COORDINATOR_MODEL == _MODEL and _TEMPERATURE == 0:
+        return get_default_llm()
+
+    sync_client, async_client = _http_clients()
+    return ChatOpenAI(
+        model=_COORDINATOR_MODEL,
+        temperature=0,
+        http_client=sync_client,
+        http_async_client=async_client
+    )
+
+
+def build_agent(key, llm=None):
+    """
+    Create an agent from its agents.yaml section
+
+    Args:
+        key: Config key in agents.yaml (e.g. 'data_analyst')
+        llm: Language model to use (optional, defaults to the shared LLM)
+
+    Returns:
+        Agent: Configured agent
+    """
+    from crewai import Agent
+
+    config = get_agent_config(key)
+
+    if llm is None:
+        llm = get_default_llm()
+
+    return Agent(
+        role=config['role'],
+        goal=config['goal'],
+        backstory=config['backstory'],
+        verbose=config['verbose'],
+        allow_delegation=config['allow_delegation'],
+        llm=llm
+    )
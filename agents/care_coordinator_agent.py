@@ -3,18 +3,7 @@ Care Coordinator Agent - The Treatment Synthesizer (BOSS)
 Integrates all recommendations into comprehensive treatment plan
 """
 
-from crewai import Agent
-from langchain_openai import ChatOpenAI
-import yaml
-import os
-
-
-def load_agent_config():
-    """Load agent configuration from YAML file"""
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'agents.yaml')
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
-    return config['care_coordinator']
+from ._factory import build_agent, get_coordinator_llm
 
 
 def create_care_coordinator_agent(llm=None):
@@ -22,32 +11,16 @@ def create_care_coordinator_agent(llm=None):
     Create and return the Care Coordinator Agent
 
     Args:
-        llm: Language model to use (optional, defaults to GPT-4o-mini)
+        llm: Language model to use (optional, defaults to the cheaper
+             coordinator LLM — synthesis does not need the specialist
+             model tier)
 
     Returns:
         Agent: Configured Care Coordinator Agent
     """
-    # Load configuration
-    config = load_agent_config()
-
-    # Set up LLM if not provided
     if llm is None:
-        llm = ChatOpenAI(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            temperature=0.7
-        )
-
-    # Create agent
-    agent = Agent(
-        role=config['role'],
-        goal=config['goal'],
-        backstory=config['backstory'],
-        verbose=config['verbose'],
-        allow_delegation=config['allow_delegation'],
-        llm=llm
-    )
-
-    return agent
+        llm = get_coordinator_llm()
+    return build_agent('care_coordinator', llm)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+"""
+Precompile agents.yaml and tasks.yaml into their pickled sidecars
+
+Run `python -m agents.precompile` at build/deploy time so cold starts
+load config/*.yaml.pkl instead of parsing YAML.
+"""
+
+import os
+
+from ._config import CONFIG_PATH, _load_fast
+
+TASKS_CONFIG_PATH = os.path.join(
+    os.path.dirname(CONFIG_PATH), 'tasks.yaml'
+)
+
+
+def main():
+    for path, kind in ((CONFIG_PATH, 'agent'), (TASKS_CONFIG_PATH, 'task')):
+        config = _load_fast(path)
+        print(f"[OK] Precompiled {path} -> {path}.pkl "
+              f"({len(config)} {kind} sections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,385 +4,396 @@ Complete redesign with state-specific food recommendations and dietary preferenc
 """
 
 import gradio as gr
-import pandas as pd
 from crew import ObesityTreatmentCrew
 from tools.patient_data_tool import PatientDataLoader, STATE_MAPPING
+from tools.state_food import get_state_food_db, get_default_state_data
+from agents._factory import _COORDINATOR_MODEL, _MODEL, _TEMPERATURE
+import asyncio
+import atexit
+import bisect
+import functools
+import collections
+import hashlib
+import json
+import queue
 import sys
-from io import StringIO
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import datetime
 import os
 import csv
+from dataclasses import dataclass, asdict
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
+# ============================================================================
+# STARTUP PREWARM
+# ============================================================================
+
+def _prewarm():
+    """
+    Warm the tiktoken encoder and the shared LLM client in the background
+
+    The first LLM call otherwise pays ~300-500ms for BPE loading and the
+    TLS handshake; doing it during startup overlaps that cost with the
+    user's think-time so the first submission starts immediately.
+    """
+    try:
+        import tiktoken
+        try:
+            tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
+        except KeyError:
+            tiktoken.get_encoding("cl100k_base")
+
+        from agents._factory import get_default_llm
+        get_default_llm()
+        print("[OK] LLM client and tokenizer prewarmed")
+    except Exception as e:
+        print(f"[WARNING] Prewarm skipped: {str(e)}")
+
+
+threading.Thread(target=_prewarm, daemon=True).start()
+
 # ============================================================================
 # USAGE LOGGING SYSTEM
 # ============================================================================
 
+LOG_FIELDNAMES = (
+    'timestamp', 'patient_id', 'age', 'gender', 'height_cm', 'weight_kg', 'bmi',
+    'bmi_category', 'state', 'residence', 'wealth_index', 'diet_preference',
+    'physical_activity', 'daily_steps', 'smoking_status', 'alcohol_consumption'
+)
+
+# Log rows are queued and flushed by a background thread so disk I/O never
+# sits on the request path; one open/write/close is amortized over a batch.
+_LOG_BATCH_SIZE = 64
+_LOG_FLUSH_INTERVAL = 1.0  # seconds
+
+_log_queue = queue.Queue()
+_log_worker_started = False
+_log_worker_lock = threading.Lock()
+
+
+def _drain_log_queue(block=True):
+    """Collect up to a batch of pending log rows from the queue"""
+    rows = []
+    try:
+        timeout = _LOG_FLUSH_INTERVAL if block else 0
+        rows.append(_log_queue.get(timeout=timeout))
+        while len(rows) < _LOG_BATCH_SIZE:
+            rows.append(_log_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return rows
+
+
+# Long-lived handle + writer, opened once by the log worker so each batch
+# write avoids the per-call mkdir/stat/open/close syscalls
+_log_file = None
+_log_writer = None
+
+
+def _open_log_writer():
+    """Create the logs directory, open the CSV and write the header once"""
+    global _log_file, _log_writer
+    logs_dir = Path("logs")
+    logs_dir.mkdir(exist_ok=True)
+
+    log_file = logs_dir / "patient_usage.csv"
+    write_header = not log_file.exists() or log_file.stat().st_size == 0
+
+    _log_file = open(log_file, 'a', newline='', encoding='utf-8')
+    _log_writer = csv.DictWriter(_log_file, fieldnames=LOG_FIELDNAMES)
+    if write_header:
+        _log_writer.writeheader()
+
+
+# Characters that force a row through csv's quoting machinery
+_CSV_SPECIALS = (',', '"', '\n', '\r')
+
+
+def _write_log_rows(rows):
+    """Append a batch of rows to the usage CSV through the shared writer"""
+    if not rows:
+        return
+    try:
+        if _log_writer is None:
+            _open_log_writer()
+        for row in rows:
+            values = [str(row.get(k, '')) for k in LOG_FIELDNAMES]
+            if any(c in v for v in values for c in _CSV_SPECIALS):
+                # Rare: field needs escaping, let csv handle quoting
+                _log_writer.writerow(row)
+            else:
+                # Fast path: our numeric/enum fields never need quoting,
+                # so a plain join skips DictWriter's per-column overhead
+                _log_file.write(','.join(values) + '\n')
+        _log_file.flush()
+    except Exception as e:
+        print(f"[WARNING] Failed to write patient log batch: {str(e)}")
+
+
+def _log_worker():
+    """Background worker: drain the queue and write batches forever"""
+    while True:
+        _write_log_rows(_drain_log_queue())
+
+
+def _flush_logs():
+    """Drain all queued rows at shutdown
+
+    _drain_log_queue caps each call at _LOG_BATCH_SIZE, so keep
+    draining until the queue is empty rather than losing the backlog.
+    """
+    while True:
+        rows = _drain_log_queue(block=False)
+        if not rows:
+            break
+        _write_log_rows(rows)
+
+
+def _ensure_log_worker():
+    """Start the log writer thread once"""
+    global _log_worker_started
+    with _log_worker_lock:
+        if not _log_worker_started:
+            threading.Thread(target=_log_worker, daemon=True).start()
+            atexit.register(_flush_logs)
+            _log_worker_started = True
+
+
 def log_patient_input(patient_data):
     """
     Log patient inputs to CSV for analytics (anonymized)
     Saves: timestamp, age, BMI, state, lifestyle factors (NO names)
+
+    Rows are enqueued and written in batches by a background thread.
     """
     try:
-        logs_dir = Path("logs")
-        logs_dir.mkdir(exist_ok=True)
-
-        log_file = logs_dir / "patient_usage.csv"
-        file_exists = log_file.exists()
-
-        with open(log_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=[
-                'timestamp', 'patient_id', 'age', 'gender', 'height_cm', 'weight_kg', 'bmi',
-                'bmi_category', 'state', 'residence', 'wealth_index', 'diet_preference',
-                'physical_activity', 'daily_steps', 'smoking_status', 'alcohol_consumption'
-            ])
-
-            if not file_exists:
-                writer.writeheader()
-
-            # Log only anonymized data (NO patient name)
-            log_entry = {
-                'timestamp': datetime.datetime.now().isoformat(),
-                'patient_id': patient_data.get('patient_id', 'unknown'),
-                'age': patient_data.get('age', ''),
-                'gender': patient_data.get('gender', ''),
-                'height_cm': patient_data.get('height_cm', ''),
-                'weight_kg': patient_data.get('weight_kg', ''),
-                'bmi': patient_data.get('bmi', ''),
-                'bmi_category': patient_data.get('bmi_category', ''),
-                'state': patient_data.get('state', ''),
-                'residence': patient_data.get('residence_type', ''),
-                'wealth_index': patient_data.get('wealth_index', ''),
-                'diet_preference': patient_data.get('dietary_preference', ''),
-                'physical_activity': patient_data.get('physical_activity', ''),
-                'daily_steps': patient_data.get('daily_steps', ''),
-                'smoking_status': patient_data.get('smoking_status', ''),
-                'alcohol_consumption': patient_data.get('alcohol_consumption', '')
-            }
-
-            writer.writerow(log_entry)
-            print(f"[LOG] Patient input logged: {patient_data.get('patient_id')}")
+        _ensure_log_worker()
+
+        # Log only anonymized data (NO patient name)
+        log_entry = {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'patient_id': patient_data.get('patient_id', 'unknown'),
+            'age': patient_data.get('age', ''),
+            'gender': patient_data.get('gender', ''),
+            'height_cm': patient_data.get('height_cm', ''),
+            'weight_kg': patient_data.get('weight_kg', ''),
+            'bmi': patient_data.get('bmi', ''),
+            'bmi_category': patient_data.get('bmi_category', ''),
+            'state': patient_data.get('state', ''),
+            'residence': patient_data.get('residence_type', ''),
+            'wealth_index': patient_data.get('wealth_index', ''),
+            'diet_preference': patient_data.get('dietary_preference', ''),
+            'physical_activity': patient_data.get('physical_activity', ''),
+            'daily_steps': patient_data.get('daily_steps', ''),
+            'smoking_status': patient_data.get('smoking_status', ''),
+            'alcohol_consumption': patient_data.get('alcohol_consumption', '')
+        }
+
+        # No success print here: enqueueing is on the request path, and the
+        # worker thread reports failures; stdout writes are not free
+        _log_queue.put(log_entry)
 
     except Exception as e:
         print(f"[WARNING] Failed to log patient input: {str(e)}")
 
 # ============================================================================
-# STATE-SPECIFIC FOOD DATABASE
+# CREW RESULT CACHE
 # ============================================================================
 
-STATE_FOOD_DATABASE = {
-    "Telangana": {
-        "staples": ["Rice", "Jowar", "Bajra"],
-        "typical_dishes": ["Hyderabadi biryani", "Pesarattu", "Sarva pindi", "Jonna rotte"],
-        "proteins": ["Mutton", "Chicken", "Lentils"],
-        "vegetables": ["Gongura", "Brinjal", "Beans", "Ridge gourd"],
-        "avoid": ["Excess oil in biryani", "Deep-fried pakoras", "Heavy cream-based curries"],
-        "recommendations": {
-            "Vegetarian": "Replace white rice with brown rice or jowar. Increase dal portions. Reduce oil in preparations.",
-            "Non-vegetarian": "Grilled chicken over biryani. Reduce portion sizes. Avoid fried preparations.",
-            "Semi-vegetarian": "Dal-based meals 4 days/week. Grilled meats 2-3 days. Focus on jowar rotis instead of white rice."
-        }
-    },
-    "Andhra Pradesh": {
-        "staples": ["Rice", "Ragi", "Jowar"],
-        "typical_dishes": ["Pesarattu", "Pulihora", "Pappu", "Gongura"],
-        "proteins": ["Lentils", "Fish", "Chicken"],
-        "vegetables": ["Brinjal", "Okra", "Ridge gourd", "Drumstick"],
-        "avoid": ["Excessive oil in curries", "Deep-fried pickles", "Excess ghee in sweets"],
-        "recommendations": {
-            "Vegetarian": "Ragi dosa, steamed idli, lentil curries with reduced oil in sambar.",
-            "Non-vegetarian": "Grilled fish with minimal oil, chicken curry with reduced coconut, tandoori preparations.",
-            "Semi-vegetarian": "Dal preparations and grilled fish twice weekly, avoid fried fish."
-        }
-    },
-    "Maharashtra": {
-        "staples": ["Rice", "Wheat (chapati)", "Jowar", "Bajra"],
-        "typical_dishes": ["Bhakri", "Pithla", "Varan bhaat", "Misal pav"],
-        "proteins": ["Lentils", "Chicken", "Fish", "Mutton"],
-        "vegetables": ["Bhendi", "Palak", "Methi", "Cabbage"],
-        "avoid": ["Excess oil in misal", "Deep-fried vada pav", "Heavy peanut-based chutneys"],
-        "recommendations": {
-            "Vegetarian": "Multigrain bhakri, steamed dhokla, reduce oil in thalipeeth, increase salad intake.",
-            "Non-vegetarian": "Grilled bombil (Bombay duck), tandoori chicken, reduce mutton frequency.",
-            "Semi-vegetarian": "Vegetarian meals 5 days/week with fish 2 days, focus on jowar."
-        }
-    },
-    "Tamil Nadu": {
-        "staples": ["Rice", "Ragi", "Kambu"],
-        "typical_dishes": ["Idli", "Dosa", "Sambar", "Rasam", "Curd rice"],
-        "proteins": ["Lentils", "Fish", "Chicken"],
-        "vegetables": ["Drumstick", "Snake gourd", "Ash gourd", "Banana stem"],
-        "avoid": ["Excess oil in dosa", "Deep-fried vada", "Sugar-laden payasam"],
-        "recommendations": {
-            "Vegetarian": "Ragi idli, steamed pongal, increase sambar vegetables, reduce coconut oil.",
-            "Non-vegetarian": "Fish curry with minimal oil, grilled chicken, chettinad style with spices not oil.",
-            "Semi-vegetarian": "Fish preparations 3 times weekly, focus on steamed preparations."
-        }
-    },
-    "Kerala": {
-        "staples": ["Rice", "Tapioca", "Wheat"],
-        "typical_dishes": ["Appam", "Puttu", "Fish curry", "Thoran", "Avial"],
-        "proteins": ["Fish", "Chicken", "Lentils", "Coconut"],
-        "vegetables": ["Plantain", "Yam", "Beans", "Drumstick"],
-        "avoid": ["Excess coconut oil", "Heavy coconut milk curries", "Fried banana chips"],
-        "recommendations": {
-            "Vegetarian": "Steamed puttu with kadala curry, reduce coconut in avial, increase vegetable thoran.",
-            "Non-vegetarian": "Fish moilee with reduced coconut milk, grilled fish, avoid fried preparations.",
-            "Semi-vegetarian": "Fish 3-4 times weekly, reduce coconut oil, focus on steamed dishes."
-        }
-    },
-    "Karnataka": {
-        "staples": ["Rice", "Ragi", "Jowar"],
-        "typical_dishes": ["Ragi mudde", "Bisi bele bath", "Jolada rotti", "Akki roti"],
-        "proteins": ["Lentils", "Chicken", "Fish"],
-        "vegetables": ["Carrot", "Beans", "Palya vegetables"],
-        "avoid": ["Excess ghee in bisi bele bath", "Deep-fried bonda", "Heavy oil in curries"],
-        "recommendations": {
-            "Vegetarian": "Ragi mudde with sambar, increase vegetable palya, reduce ghee.",
-            "Non-vegetarian": "Grilled chicken, fish curry with minimal oil, tandoori preparations.",
-            "Semi-vegetarian": "Ragi-based meals with fish twice weekly, focus on millets."
-        }
-    },
-    "Gujarat": {
-        "staples": ["Wheat (rotli)", "Bajra", "Jowar"],
-        "typical_dishes": ["Dhokla", "Khichdi", "Thepla", "Undhiyu"],
-        "proteins": ["Lentils", "Buttermilk", "Curd"],
-        "vegetables": ["Bottle gourd", "Ridge gourd", "Fenugreek", "Cluster beans"],
-        "avoid": ["Excess sugar in dishes", "Deep-fried farsans", "Heavy ghee usage"],
-        "recommendations": {
-            "Vegetarian": "Steamed dhokla, reduce sugar in dal, multigrain rotli, increase raw salads.",
-            "Non-vegetarian": "Not typically applicable - focus on protein from dal and dairy.",
-            "Semi-vegetarian": "Maintain vegetarian base, add fish once weekly for coastal regions."
-        }
-    },
-    "Punjab": {
-        "staples": ["Wheat (roti)", "Rice", "Makki (corn)"],
-        "typical_dishes": ["Makki ki roti", "Sarson da saag", "Dal makhani", "Chole"],
-        "proteins": ["Lentils", "Chicken", "Paneer", "Curd"],
-        "vegetables": ["Spinach", "Mustard greens", "Radish", "Onions"],
-        "avoid": ["Excess butter/ghee", "Heavy cream in dal", "Deep-fried pakoras"],
-        "recommendations": {
-            "Vegetarian": "Reduce butter in saag, use low-fat paneer, increase salad portions.",
-            "Non-vegetarian": "Tandoori chicken without cream, reduce butter chicken frequency.",
-            "Semi-vegetarian": "Dal-based meals 4-5 days, grilled chicken 2-3 days, reduce dairy fats."
-        }
-    },
-    "West Bengal": {
-        "staples": ["Rice", "Wheat"],
-        "typical_dishes": ["Fish curry", "Luchi", "Posto", "Shukto"],
-        "proteins": ["Fish", "Lentils", "Eggs"],
-        "vegetables": ["Bitter gourd", "Pumpkin", "Plantain", "Potato"],
-        "avoid": ["Excess mustard oil in fish curry", "Deep-fried luchi", "Heavy sweets"],
-        "recommendations": {
-            "Vegetarian": "Shukto without excess oil, steamed vegetables, reduce potato usage.",
-            "Non-vegetarian": "Steamed fish, reduce oil in curry, avoid fried fish.",
-            "Semi-vegetarian": "Fish 4-5 times weekly, reduce oil, focus on steamed preparations."
-        }
-    },
-    "Rajasthan": {
-        "staples": ["Wheat (roti)", "Bajra", "Jowar"],
-        "typical_dishes": ["Dal baati churma", "Gatte ki sabzi", "Ker sangri"],
-        "proteins": ["Lentils", "Buttermilk", "Mutton (occasional)"],
-        "vegetables": ["Beans", "Ker berries", "Sangri beans"],
-        "avoid": ["Excess ghee in baati", "Deep-fried preparations", "Heavy sugar in churma"],
-        "recommendations": {
-            "Vegetarian": "Reduce ghee in dal baati, increase green vegetables, multigrain rotis.",
-            "Non-vegetarian": "Reduce mutton frequency, focus on lentil proteins.",
-            "Semi-vegetarian": "Primarily vegetarian with occasional lean meat, focus on bajra."
-        }
-    },
-    "Delhi": {
-        "staples": ["Wheat (roti)", "Rice"],
-        "typical_dishes": ["Chole bhature", "Parathas", "Street food"],
-        "proteins": ["Paneer", "Chicken", "Lentils"],
-        "vegetables": ["Mixed vegetables", "Cauliflower", "Peas"],
-        "avoid": ["Deep-fried bhature", "Excess butter in parathas", "Heavy street food"],
-        "recommendations": {
-            "Vegetarian": "Steamed preparations over fried, reduce paneer frequency, increase salads.",
-            "Non-vegetarian": "Grilled chicken, tandoori items, reduce curry richness.",
-            "Semi-vegetarian": "Balance with 3-4 vegetarian days, focus on grilled preparations."
-        }
-    }
-}
+# A crew kickoff costs five LLM calls; identical anonymized inputs (same
+# age/BMI/state/diet/lifestyle) are common in demos and repeat visits, so
+# final plans are cached on disk keyed by a hash of the input.
+CREW_CACHE_DIR = Path("cache") / "crew_results"
+_CREW_CACHE_MAX_ENTRIES = 256
 
-# Add default for states not in database
-DEFAULT_STATE_DATA = {
-    "staples": ["Rice", "Wheat", "Millets"],
-    "typical_dishes": ["Regional variations of Indian cuisine"],
-    "proteins": ["Lentils", "Chicken", "Fish"],
-    "vegetables": ["Seasonal local vegetables"],
-    "avoid": ["Excess oil and ghee", "Deep-fried foods", "Refined sugars"],
-    "recommendations": {
-        "Vegetarian": "Focus on whole grains, increase vegetables, reduce oil, add protein from lentils and dairy.",
-        "Non-vegetarian": "Grilled/baked meats, fish 2-3 times weekly, reduce red meat, avoid fried preparations.",
-        "Semi-vegetarian": "Vegetarian meals 4-5 days with fish/chicken 2-3 days, focus on whole grains."
-    }
-}
+# Volatile per-submission fields that must not affect the cache key
+_CACHE_EXCLUDED_KEYS = ('patient_id', 'patient_name')
 
-# ============================================================================
-# CUSTOM CSS FOR MODERN UI
-# ============================================================================
+# Upper bound on buffered agent-log messages per request
+_AGENT_LOG_MAXLEN = 2000
 
-CUSTOM_CSS = """
-/* Modern Medical UI Theme */
-.gradio-container {
-    font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-}
+# Shared workers for running crews off the request thread (streaming path)
+_CREW_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="crewrun")
 
-/* Card styling */
-.input-section {
-    background: white;
-    border-radius: 12px;
-    padding: 1.5rem;
-    margin-bottom: 1.5rem;
-    box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-    border: 1px solid #e1e8ed;
-}
+# Patients pre-sampled at warm-up for the Load Sample Patient button
+_SAMPLE_POOL_SIZE = 32
 
-/* Section headers */
-.section-header {
-    font-size: 1.1rem;
-    font-weight: 600;
-    color: #2c3e50;
-    margin-bottom: 1rem;
-    padding-bottom: 0.5rem;
-    border-bottom: 2px solid #0066cc;
-}
 
-/* Info boxes */
-.info-box {
-    background: #e8f4fd;
-    border-left: 4px solid #0066cc;
-    padding: 1rem;
-    border-radius: 6px;
-    margin: 1rem 0;
-}
+def _crew_cache_key(patient_data):
+    """Canonical SHA-256 key for a patient input dict
 
-.warning-box {
-    background: #fff3cd;
-    border-left: 4px solid #ffc107;
-    padding: 1rem;
-    border-radius: 6px;
-    margin: 1rem 0;
-}
+    The LLM identity is part of the key: the same inputs produce a
+    different plan under a different model or temperature, so a config
+    change must not serve entries generated under the old one.
+    """
+    payload = {k: v for k, v in patient_data.items() if k not in _CACHE_EXCLUDED_KEYS}
+    payload['__model'] = _MODEL
+    payload['__coordinator_model'] = _COORDINATOR_MODEL
+    payload['__temperature'] = _TEMPERATURE
+    # orjson serializes the nested dict several times faster than json;
+    # fall back silently when it is not installed
+    if orjson is not None:
+        canonical = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)
+    else:
+        canonical = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def get_cached_plan(patient_data):
+    """Return a cached treatment plan for identical inputs, or None"""
+    try:
+        path = CREW_CACHE_DIR / f"{_crew_cache_key(patient_data)}.json"
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        os.utime(path)  # refresh mtime so LRU eviction keeps hot entries
+        return entry['plan']
+    except Exception as e:
+        print(f"[WARNING] Crew cache read failed: {str(e)}")
+        return None
 
-/* Primary button styling */
-.primary-btn button {
-    background: linear-gradient(135deg, #0066cc 0%, #0052a3 100%) !important;
-    border: none !important;
-    color: white !important;
-    font-weight: 600 !important;
-    padding: 0.75rem 2rem !important;
-    font-size: 1.05rem !important;
-}
-"""
+
+def store_cached_plan(patient_data, plan):
+    """Persist a treatment plan and evict the oldest entries beyond the cap"""
+    try:
+        CREW_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = CREW_CACHE_DIR / f"{_crew_cache_key(patient_data)}.json"
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'plan': str(plan)}, f, ensure_ascii=False)
+
+        entries = sorted(CREW_CACHE_DIR.glob('*.json'), key=os.path.getmtime)
+        for stale in entries[:-_CREW_CACHE_MAX_ENTRIES]:
+            stale.unlink(missing_ok=True)
+    except Exception as e:
+        print(f"[WARNING] Crew cache write failed: {str(e)}")
 
 # ============================================================================
-# MODERN GRADIO INTERFACE
+# STATE-SPECIFIC FOOD DATABASE
 # ============================================================================
 
-class ModernGradioInterface:
-    """Modern Gradio interface with enhanced UX"""
+# The food database lives in data/state_food_db.json and is parsed once
+# per process; keeping it out of app.py shrinks the module's bytecode and
+# shares a single canonical copy across Gradio workers.
+STATE_FOOD_DATABASE = get_state_food_db()
+
+# Default for states not in the database
+DEFAULT_STATE_DATA = get_default_state_data()
+
+# Merged per-state lookup: one hash probe yields both the NFHS state code
+# and the food entry, instead of consulting STATE_MAPPING and the food
+# database separately per submission
+_STATE_CODES = {name: code for code, name in STATE_MAPPING.items()}
+STATE_COMBINED = {
+    name: (_STATE_CODES.get(name), STATE_FOOD_DATABASE.get(name, DEFAULT_STATE_DATA))
+    for name in set(_STATE_CODES) | set(STATE_FOOD_DATABASE)
+}
+_DEFAULT_STATE_PAIR = (None, DEFAULT_STATE_DATA)
+
+# Pre-joined display strings: the database is read-only and there are only
+# three diet preferences, so the filtered protein lists and joined food
+# strings are computed once here instead of per request
+DIET_PREFERENCES = ("Vegetarian", "Non-vegetarian", "Semi-vegetarian")
+_VEG_PROTEINS = frozenset((
+    'Lentils', 'Dal', 'Paneer', 'Curd', 'Buttermilk',
+    'Tofu', 'Soy', 'Chickpeas', 'Beans'
+))
+
+# Dropdown/radio option sets, frozen as module-level tuples so
+# create_interface loads constants instead of rebuilding and re-sorting
+# lists, and so the options can't be mutated through a component
+STATE_OPTIONS = tuple(sorted(STATE_MAPPING.values()))
+GENDER_CHOICES = ("Female", "Male")
+WALKING_CHOICES = ("Yes", "No", "Don't Know")
+STEP_CHOICES = (
+    "< 2000 steps (Sedentary)", "2000-5000 steps (Low Active)",
+    "5000-10000 steps (Active)", "10000+ steps (Very Active)",
+    "Not Applicable"
+)
+SMOKING_CHOICES = (
+    "Never", "Former Smoker",
+    "Current Smoker (< 10/day)", "Current Smoker (10+/day)"
+)
+ALCOHOL_CHOICES = (
+    "Never", "Occasional (1-2 times/month)",
+    "Moderate (1-2 times/week)", "Frequent (3+ times/week)"
+)
+RESIDENCE_CHOICES = ("Urban", "Rural")
+WEALTH_CHOICES = ("Poorest", "Poorer", "Middle", "Richer", "Richest")
+
+
+def _food_strings(data):
+    """Pre-join the display strings for one state entry"""
+    return {
+        'staples': ', '.join(data['staples']),
+        'dishes': ', '.join(data['typical_dishes']),
+        'vegetables': ', '.join(data['vegetables']),
+        'avoid': '\n'.join('• ' + item for item in data['avoid']),
+        'proteins': {
+            dp: ', '.join(
+                data['proteins'] if dp != 'Vegetarian'
+                else [p for p in data['proteins'] if p in _VEG_PROTEINS]
+            )
+            for dp in DIET_PREFERENCES
+        },
+    }
 
-    def __init__(self):
-        if not os.getenv("OPENAI_API_KEY"):
-            raise ValueError("OPENAI_API_KEY not found")
-        self.crew = None
-        self.data_loader = None
-        print("Modern UI initialized (lazy loading)")
 
-    def _ensure_initialized(self):
-        """Lazy initialization"""
-        if self.crew is None:
-            print("Initializing AI crew...")
-            self.crew = ObesityTreatmentCrew()
-        if self.data_loader is None:
-            print("Loading patient data...")
-            self.data_loader = PatientDataLoader()
+FOOD_STRINGS = {
+    name: _food_strings(data) for name, (_code, data) in STATE_COMBINED.items()
+}
+_DEFAULT_FOOD_STRINGS = _food_strings(DEFAULT_STATE_DATA)
 
-    def calculate_bmi(self, weight_kg, height_cm):
-        """Calculate BMI with proper None handling"""
-        try:
-            # Handle None, empty string, or invalid values
-            if weight_kg is None or weight_kg == "" or float(weight_kg) <= 0:
-                return 0.0, "Invalid"
-            if height_cm is None or height_cm == "" or float(height_cm) <= 0:
-                return 0.0, "Invalid"
-
-            weight_kg = float(weight_kg)
-            height_cm = float(height_cm)
-
-            height_m = height_cm / 100
-            bmi = weight_kg / (height_m ** 2)
-
-            # Asian BMI cutoffs
-            if bmi < 18.5:
-                category = "Underweight"
-            elif 18.5 <= bmi < 23.0:
-                category = "Normal"
-            elif 23.0 <= bmi < 27.5:
-                category = "Overweight"
-            else:
-                category = "Obese"
+# ============================================================================
+# CUSTOM CSS FOR MODERN UI
+# ============================================================================
 
-            return round(bmi, 2), category
-        except (ValueError, TypeError, ZeroDivisionError):
-            return 0.0, "Invalid"
+# The stylesheet lives in static/app.css; read once at import so Blocks
+# construction reuses the same string instead of re-building it per launch
+_CSS_PATH = Path(__file__).parent / "static" / "app.css"
+CUSTOM_CSS = _CSS_PATH.read_text(encoding="utf-8")
 
-    def cm_to_feet_inches(self, cm):
-        """Convert cm to feet and inches"""
-        try:
-            if cm is None or cm == "" or float(cm) <= 0:
-                return 0, 0.0
-            cm = float(cm)
-            total_inches = cm / 2.54
-            feet = int(total_inches // 12)
-            inches = round(total_inches % 12, 1)
-            return feet, inches
-        except (ValueError, TypeError):
-            return 0, 0.0
+@functools.lru_cache(maxsize=256)
+def _render_food_recs(state, diet_pref):
+    """Render the state-specific food recommendation Markdown (cached)"""
+    _, state_data = STATE_COMBINED.get(state, _DEFAULT_STATE_PAIR)
+    strings = FOOD_STRINGS.get(state, _DEFAULT_FOOD_STRINGS)
 
-    def feet_inches_to_cm(self, feet, inches):
-        """Convert feet and inches to cm"""
-        try:
-            feet = float(feet) if feet is not None and feet != "" else 0
-            inches = float(inches) if inches is not None and inches != "" else 0
-            total_inches = (feet * 12) + inches
-            return round(total_inches * 2.54, 1)
-        except (ValueError, TypeError):
-            return 0.0
+    recommendation_text = state_data['recommendations'].get(diet_pref,
+                            state_data['recommendations'].get('Vegetarian', ''))
+    protein_text = strings['proteins'].get(diet_pref, strings['proteins']['Vegetarian'])
 
-    def get_state_food_recommendations(self, state, diet_pref):
-        """Get state-specific food recommendations"""
-        state_data = STATE_FOOD_DATABASE.get(state, DEFAULT_STATE_DATA)
-
-        recommendation_text = state_data['recommendations'].get(diet_pref,
-                                state_data['recommendations'].get('Vegetarian', ''))
-
-        output = f"""
+    output = f"""
 ### 🍛 State-Specific Dietary Recommendations: {state}
 
 **Your Dietary Preference:** {diet_pref}
 
 #### Typical Staples in {state}:
-{', '.join(state_data['staples'])}
+{strings['staples']}
 
 #### Traditional Dishes:
-{', '.join(state_data['typical_dishes'])}
+{strings['dishes']}
 
 #### Recommended Protein Sources ({diet_pref}):
-{', '.join([p for p in state_data['proteins'] if (diet_pref == 'Non-vegetarian' or diet_pref == 'Semi-vegetarian' or p in ['Lentils', 'Dal', 'Paneer', 'Curd', 'Buttermilk', 'Tofu', 'Soy', 'Chickpeas', 'Beans'])])}
+{protein_text}
 
 #### Local Vegetables:
-{', '.join(state_data['vegetables'])}
+{strings['vegetables']}
 
 ---
 
 ### ⚠️ Foods to AVOID:
-{chr(10).join(['• ' + item for item in state_data['avoid']])}
+{strings['avoid']}
 
 ---
 
@@ -410,20 +421,13 @@ class ModernGradioInterface:
 • Avoid sweetened beverages
 • Include buttermilk, coconut water
 """
-        return output
+    return output
 
-    def generate_treatment_plan(
-        self,
-        name, age, gender, height_cm, weight, diet_preference,
-        does_walking, daily_steps, smoking_status, alcohol_consumption,
-        state, residence_type, wealth_index,
-        progress=gr.Progress()
-    ):
-        """Generate comprehensive treatment plan"""
 
-        try:
-            # Show loading animation immediately
-            loading_msg = """
+# Static HTML chrome used by the event handlers, built once at import so
+# per-call formatting only fills the dynamic slots
+
+LOADING_MSG_HTML = """
 <div style="text-align: center; padding: 60px 40px;">
     <div style="display: inline-flex; gap: 8px; margin-bottom: 20px;">
         <div style="width: 12px; height: 12px; border-radius: 50%; background: #2563eb; animation: pulse 1.5s ease-in-out infinite;"></div>
@@ -433,93 +437,34 @@ class ModernGradioInterface:
     <p style="color: #64748b; font-size: 16px; font-weight: 500; margin: 0;">AI agents are analyzing your profile...</p>
     <p style="color: #94a3b8; font-size: 13px; margin: 8px 0 0 0;">This usually takes 1-3 minutes</p>
 </div>
-
-<style>
-@keyframes pulse {
-    0%, 100% { opacity: 0.3; transform: scale(1); }
-    50% { opacity: 1; transform: scale(1.2); }
-}
-</style>
 """
+# The pulse @keyframes rule lives in static/app.css (loaded once via
+# gr.Blocks(css=...)) so each loading update ships only the three divs
+# instead of re-sending and re-parsing the same stylesheet
+
+# (background, text color, icon) per BMI category for the display card
+_BMI_STYLES = {
+    "Normal": ("#dcfce7", "#166534", "✅"),
+    "Overweight": ("#fef9c3", "#854d0e", "⚠️"),
+    "Obese": ("#fee2e2", "#991b1b", "🔴"),
+    "Underweight": ("#e0e7ff", "#3730a3", "ℹ️"),
+}
 
-            # Validate inputs
-            if not height_cm or not weight or not age:
-                return "❌ Error: Please fill all required fields", "", ""
-
-            height_cm = float(height_cm)
-            weight = float(weight)
-            age = int(age)
-
-            if height_cm <= 0 or weight <= 0 or age < 18:
-                return "❌ Error: Invalid height, weight, or age values", "", ""
-
-            progress(0.05, desc="Initializing...")
-
-            # Return loading message while processing starts
-            yield loading_msg, "", ""
-
-            self._ensure_initialized()
-
-            # Calculate BMI
-            bmi, bmi_category = self.calculate_bmi(weight, height_cm)
-
-            if bmi == 0.0:
-                return "❌ Error: Invalid BMI calculation", "", ""
-
-            progress(0.1, desc="Analyzing patient data...")
-
-            # Get food recommendations
-            food_recommendations = self.get_state_food_recommendations(state, diet_preference)
-
-            # Create patient data
-            feet, inches = self.cm_to_feet_inches(height_cm)
-            patient_data = {
-                "patient_id": f"HF_USER_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                "patient_name": name if name and name.strip() else "Anonymous",
-                "age": age,
-                "gender": gender,
-                "height_cm": height_cm,
-                "weight_kg": weight,
-                "bmi": bmi,
-                "bmi_category": bmi_category,
-                "state": state,
-                "residence_type": residence_type,
-                "wealth_index": wealth_index,
-                "dietary_preference": diet_preference,
-                "location_context": f"{residence_type} area in {state}",
-                "socioeconomic_status": wealth_index,
-                # Lifestyle factors
-                "physical_activity": does_walking,
-                "daily_steps": daily_steps,
-                "smoking_status": smoking_status,
-                "alcohol_consumption": alcohol_consumption,
-            }
-
-            # Log patient input (anonymized - no name)
-            log_patient_input(patient_data)
-
-            progress(0.3, desc="AI agents analyzing...")
-
-            # Capture agent output
-            captured_output = StringIO()
-            sys.stdout = captured_output
-
-            try:
-                result = self.crew.create_treatment_plan(patient_data)
-                progress(1.0, desc="Complete!")
-            finally:
-                sys.stdout = sys.__stdout__
-
-            agent_logs = captured_output.getvalue()
-            treatment_plan = str(result)
+_BMI_HTML_FMT = """<div style="padding: 15px; text-align: center; border-radius: 8px; background: {bg};">
+                    <div style="font-size: 32px; font-weight: bold; color: {fg};">{bmi}</div>
+                    <div style="font-size: 16px; color: {fg}; margin-top: 5px;">{icon} {category}</div>
+                    </div>"""
 
-            # Format summary
-            name_display = f"**Patient:** {patient_data['patient_name']}\n" if patient_data['patient_name'] != "Anonymous" else ""
+BMI_INVALID_HTML = """<div style="padding: 15px; text-align: center; border-radius: 8px; background: #f1f5f9;">
+                    <div style="font-size: 28px; font-weight: bold; color: #94a3b8;">0.00</div>
+                    <div style="font-size: 14px; color: #64748b;">Invalid</div></div>"""
 
-            summary = f"""
+# Result-summary Markdown; the static chrome is most of the text, so it
+# lives in one reusable template filled per request via format_map
+_SUMMARY_FMT = """
 # 📋 Patient Summary
 
-{name_display}**ID:** {patient_data['patient_id']}
+{name_display}**ID:** {patient_id}
 **Age:** {age} years | **Height:** {height_cm} cm ({feet}' {inches}") | **Weight:** {weight} kg
 **BMI:** {bmi} ({bmi_category}) | **Location:** {state}, {residence_type}
 **Dietary Preference:** {diet_preference} | **Socioeconomic Status:** {wealth_index}
@@ -531,7 +476,347 @@ class ModernGradioInterface:
 {treatment_plan}
 """
 
-            yield summary, food_recommendations, agent_logs
+
+# These helpers fire on every keystroke in the height/weight fields, but
+# their inputs are discrete (integer feet, 0.1-step inches, integer kg),
+# so memoizing the quantized math removes the repeated float work.
+
+# Asian BMI cutoffs; bisect over the thresholds classifies without a
+# branch chain, and the category strings stay out of the math entirely
+_BMI_THRESHOLDS = (18.5, 23.0, 27.5)
+_BMI_CATS = ("Underweight", "Normal", "Overweight", "Obese")
+
+
+# Pre-allocated error results: the invalid branches run on keystroke
+# storms, so they return shared singletons instead of building a tuple
+# per call
+_INVALID_BMI = (0.0, "Invalid")
+_INVALID_FTIN = (0, 0.0)
+
+
+def _safe_float(x):
+    """Parse a form value to a positive float, or None if unusable
+
+    Returning None instead of raising keeps the per-keystroke helpers off
+    the exception machinery for ordinary empty/partial input.
+    """
+    if x is None or x == "":
+        return None
+    try:
+        v = float(x)
+    except (ValueError, TypeError):
+        return None
+    return v if v > 0 else None
+
+
+@functools.lru_cache(maxsize=4096)
+def _bmi_core(weight_q, height_q):
+    """Compute (bmi, category) for quantized positive inputs (cached)"""
+    height_m = height_q / 100
+    bmi = weight_q / (height_m ** 2)
+    return round(bmi, 2), _BMI_CATS[bisect.bisect(_BMI_THRESHOLDS, bmi)]
+
+
+@functools.lru_cache(maxsize=1024)
+def _feet_inches_core(cm_q):
+    """Convert quantized cm to (feet, inches) (cached)"""
+    total_inches = cm_q / 2.54
+    feet = int(total_inches // 12)
+    inches = round(total_inches % 12, 1)
+    return feet, inches
+
+
+# ============================================================================
+# MODERN GRADIO INTERFACE
+# ============================================================================
+
+@dataclass(frozen=True)
+class PatientProfile:
+    """
+    One validated submission, frozen after construction
+
+    __slots__ drops the per-instance __dict__ and makes attribute access a
+    fixed-offset load; the crew/logging/cache layers still consume a plain
+    dict, produced once via asdict() at that boundary.
+    """
+    __slots__ = (
+        'patient_id', 'patient_name', 'age', 'gender', 'height_cm',
+        'weight_kg', 'bmi', 'bmi_category', 'state', 'residence_type',
+        'wealth_index', 'dietary_preference', 'location_context',
+        'socioeconomic_status', 'physical_activity', 'daily_steps',
+        'smoking_status', 'alcohol_consumption'
+    )
+
+    patient_id: str
+    patient_name: str
+    age: int
+    gender: str
+    height_cm: float
+    weight_kg: float
+    bmi: float
+    bmi_category: str
+    state: str
+    residence_type: str
+    wealth_index: str
+    dietary_preference: str
+    location_context: str
+    socioeconomic_status: str
+    physical_activity: str
+    daily_steps: str
+    smoking_status: str
+    alcohol_consumption: str
+
+
+class ModernGradioInterface:
+    """Modern Gradio interface with enhanced UX"""
+
+    def __init__(self):
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY not found")
+        self.crew = None
+        self.data_loader = None
+        self._sample_pool = collections.deque()
+        # Build the crew and parse the patient CSV in the background so the
+        # cost overlaps the user's form-filling time instead of landing on
+        # their first click
+        self._init_future = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="appwarm"
+        ).submit(self._warm)
+        print("Modern UI initialized (prefetching in background)")
+
+    def _warm(self):
+        """Construct the crew and data loader, and prime the food-rec cache"""
+        print("Initializing AI crew...")
+        crew = ObesityTreatmentCrew()
+        print("Loading patient data...")
+        data_loader = PatientDataLoader()
+        # Pre-warm the food recommendation cache so first clicks are instant
+        for state in STATE_MAPPING.values():
+            for diet_pref in ("Vegetarian", "Non-vegetarian", "Semi-vegetarian"):
+                _render_food_recs(state, diet_pref)
+        # Pre-sample a pool for the Load Sample Patient button so each
+        # click is a deque rotation instead of a DataFrame sample
+        self._sample_pool = collections.deque(
+            data_loader.get_random_patient() for _ in range(_SAMPLE_POOL_SIZE)
+        )
+        return crew, data_loader
+
+    def _ensure_initialized(self):
+        """Wait for the background warm-up (usually already finished)"""
+        if self.crew is None or self.data_loader is None:
+            self.crew, self.data_loader = self._init_future.result()
+
+    def calculate_bmi(self, weight_kg, height_cm):
+        """Calculate BMI with proper None handling"""
+        w = _safe_float(weight_kg)
+        h = _safe_float(height_cm)
+        if w is None or h is None:
+            return _INVALID_BMI
+
+        # Quantize so repeat keystrokes hit the memoized core
+        return _bmi_core(round(w, 1), round(h, 1))
+
+    def cm_to_feet_inches(self, cm):
+        """Convert cm to feet and inches"""
+        cm = _safe_float(cm)
+        if cm is None:
+            return _INVALID_FTIN
+        return _feet_inches_core(round(cm, 1))
+
+    def feet_inches_to_cm(self, feet, inches):
+        """Convert feet and inches to cm"""
+        feet = _safe_float(feet) or 0
+        inches = _safe_float(inches) or 0
+        total_inches = (feet * 12) + inches
+        return round(total_inches * 2.54, 1)
+
+    def get_state_food_recommendations(self, state, diet_pref):
+        """Get state-specific food recommendations"""
+        # Pure function of two strings over static data: only ~state x 3
+        # diet prefs unique outputs, so the rendered Markdown is cached
+        return _render_food_recs(state, diet_pref)
+
+    def _build_treatment_outputs(
+        self,
+        name, age, gender, height_cm, weight, diet_preference,
+        does_walking, daily_steps, smoking_status, alcohol_consumption,
+        state, residence_type, wealth_index,
+        progress=None, log_callback=None
+    ):
+        """
+        Validate inputs and run the crew for a single submission
+
+        Args:
+            log_callback: Optional callable additionally receiving each
+                          agent-log message as it arrives (used by the
+                          streaming path to show partial output)
+
+        Returns:
+            tuple: (summary_markdown, food_recommendations, agent_logs)
+        """
+        def report(fraction, desc):
+            if progress is not None:
+                progress(fraction, desc=desc)
+
+        # Validate everything cheap first: rejected submissions must return
+        # in microseconds, not after waiting on crew/data initialization
+        if not height_cm or not weight or not age:
+            return "❌ Error: Please fill all required fields", "", ""
+
+        height_cm = float(height_cm)
+        weight = float(weight)
+        age = int(age)
+
+        if height_cm <= 0 or weight <= 0 or age < 18:
+            return "❌ Error: Invalid height, weight, or age values", "", ""
+
+        if diet_preference not in DIET_PREFERENCES:
+            return "❌ Error: Unknown dietary preference", "", ""
+
+        if state not in STATE_OPTIONS:
+            return "❌ Error: Unknown state", "", ""
+
+        # calculate_bmi is pure math and needs no initialization
+        bmi, bmi_category = self.calculate_bmi(weight, height_cm)
+
+        if bmi == 0.0:
+            return "❌ Error: Invalid BMI calculation", "", ""
+
+        report(0.05, "Initializing...")
+        self._ensure_initialized()
+
+        report(0.1, "Analyzing patient data...")
+
+        # Get food recommendations
+        food_recommendations = self.get_state_food_recommendations(state, diet_preference)
+
+        # Create patient profile
+        feet, inches = self.cm_to_feet_inches(height_cm)
+        profile = PatientProfile(
+            patient_id=f"HF_USER_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            patient_name=name if name and name.strip() else "Anonymous",
+            age=age,
+            gender=gender,
+            height_cm=height_cm,
+            weight_kg=weight,
+            bmi=bmi,
+            bmi_category=bmi_category,
+            state=state,
+            residence_type=residence_type,
+            wealth_index=wealth_index,
+            dietary_preference=diet_preference,
+            location_context=f"{residence_type} area in {state}",
+            socioeconomic_status=wealth_index,
+            # Lifestyle factors
+            physical_activity=does_walking,
+            daily_steps=daily_steps,
+            smoking_status=smoking_status,
+            alcohol_consumption=alcohol_consumption,
+        )
+        # Single dict materialization for the crew/logging/cache boundary
+        patient_data = asdict(profile)
+
+        # Log patient input (anonymized - no name)
+        log_patient_input(patient_data)
+
+        report(0.3, "AI agents analyzing...")
+
+        # Serve identical inputs from the on-disk cache before paying for
+        # a five-agent kickoff
+        cached_plan = get_cached_plan(patient_data)
+        if cached_plan is not None:
+            report(1.0, "Complete!")
+            treatment_plan = cached_plan
+            agent_logs = "[CACHE] Served previously generated plan for identical inputs"
+        else:
+            # Collect agent activity via the crew's log callback instead of
+            # redirecting sys.stdout (which is global and unsafe with the
+            # batched, multi-threaded handler). The deque is bounded so a
+            # runaway verbose agent cannot grow the buffer without limit.
+            log_lines = collections.deque(maxlen=_AGENT_LOG_MAXLEN)
+
+            def sink(msg):
+                msg = str(msg)
+                log_lines.append(msg)
+                if log_callback is not None:
+                    log_callback(msg)
+
+            result = self.crew.create_treatment_plan(
+                patient_data, log_callback=sink
+            )
+            report(1.0, "Complete!")
+
+            agent_logs = "\n".join(log_lines)
+            treatment_plan = str(result)
+            store_cached_plan(patient_data, treatment_plan)
+
+        # Format summary from the precompiled template; only the dynamic
+        # slots are evaluated per request
+        name_display = f"**Patient:** {profile.patient_name}\n" if profile.patient_name != "Anonymous" else ""
+
+        summary = _SUMMARY_FMT.format_map({
+            'name_display': name_display,
+            'patient_id': profile.patient_id,
+            'age': age,
+            'height_cm': height_cm,
+            'feet': feet,
+            'inches': inches,
+            'weight': weight,
+            'bmi': bmi,
+            'bmi_category': bmi_category,
+            'state': state,
+            'residence_type': residence_type,
+            'diet_preference': diet_preference,
+            'wealth_index': wealth_index,
+            'treatment_plan': treatment_plan,
+        })
+
+        return summary, food_recommendations, agent_logs
+
+    async def generate_treatment_plan(
+        self,
+        name, age, gender, height_cm, weight, diet_preference,
+        does_walking, daily_steps, smoking_status, alcohol_consumption,
+        state, residence_type, wealth_index,
+        progress=gr.Progress()
+    ):
+        """Generate comprehensive treatment plan (single streaming submission)"""
+
+        try:
+            # Show loading animation immediately while processing starts
+            yield LOADING_MSG_HTML, "", ""
+
+            # Run the crew on a worker thread and stream each agent-log
+            # message as it arrives, so the user watches progress during
+            # the 1-3 minute run instead of a silent spinner until the end.
+            # Async polling keeps the event loop free for other users' UI
+            # events (BMI updates, conversions) during the LLM waits.
+            log_q = queue.Queue()
+            future = asyncio.get_running_loop().run_in_executor(
+                _CREW_EXECUTOR,
+                functools.partial(
+                    self._build_treatment_outputs,
+                    name, age, gender, height_cm, weight, diet_preference,
+                    does_walking, daily_steps, smoking_status, alcohol_consumption,
+                    state, residence_type, wealth_index,
+                    progress=progress, log_callback=log_q.put
+                )
+            )
+
+            streamed = []
+            while not future.done():
+                await asyncio.sleep(0.25)
+                drained = False
+                while True:
+                    try:
+                        streamed.append(log_q.get_nowait())
+                        drained = True
+                    except queue.Empty:
+                        break
+                if drained:
+                    yield LOADING_MSG_HTML, "", "\n".join(streamed)
+
+            yield await future
 
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
@@ -542,10 +827,7 @@ class ModernGradioInterface:
     def create_interface(self):
         """Create modern Gradio interface"""
 
-        state_options = sorted(list(STATE_MAPPING.values()))
-
-        # Gradio 6.x doesn't accept css parameter, only title
-        with gr.Blocks(title="AI Obesity Treatment Planner") as interface:
+        with gr.Blocks(title="AI Obesity Treatment Planner", css=CUSTOM_CSS) as interface:
 
             # Header
             gr.Markdown("""
@@ -570,7 +852,7 @@ class ModernGradioInterface:
                     age_input = gr.Number(value=35, label="Age (years)", minimum=18, maximum=80, step=1)
 
                     gender_input = gr.Radio(
-                        choices=["Female", "Male"],
+                        choices=GENDER_CHOICES,
                         value="Female",
                         label="Gender",
                         info="📊 In India, obesity rates are higher in women (24%) vs men (22%)"
@@ -596,7 +878,7 @@ class ModernGradioInterface:
 
                     gr.HTML('<div class="section-header">🥗 Dietary Preferences</div>')
                     diet_preference = gr.Radio(
-                        choices=["Vegetarian", "Non-vegetarian", "Semi-vegetarian"],
+                        choices=DIET_PREFERENCES,
                         value="Vegetarian",
                         label="Food Preference",
                         info="Meal plans will be customized to your preference"
@@ -606,15 +888,14 @@ class ModernGradioInterface:
 
                     # Walking/Exercise
                     does_walking = gr.Radio(
-                        choices=["Yes", "No", "Don't Know"],
+                        choices=WALKING_CHOICES,
                         value="Don't Know",
                         label="Do you walk regularly or exercise?",
                         info="Help us understand your current activity level"
                     )
 
                     daily_steps = gr.Radio(
-                        choices=["< 2000 steps (Sedentary)", "2000-5000 steps (Low Active)",
-                                "5000-10000 steps (Active)", "10000+ steps (Very Active)", "Not Applicable"],
+                        choices=STEP_CHOICES,
                         value="Not Applicable",
                         label="Daily Steps (if known)",
                         info="Average steps per day"
@@ -622,24 +903,24 @@ class ModernGradioInterface:
 
                     # Smoking & Alcohol
                     smoking_status = gr.Radio(
-                        choices=["Never", "Former Smoker", "Current Smoker (< 10/day)", "Current Smoker (10+/day)"],
+                        choices=SMOKING_CHOICES,
                         value="Never",
                         label="Smoking Status",
                         info="Affects metabolism and treatment approach"
                     )
 
                     alcohol_consumption = gr.Radio(
-                        choices=["Never", "Occasional (1-2 times/month)", "Moderate (1-2 times/week)", "Frequent (3+ times/week)"],
+                        choices=ALCOHOL_CHOICES,
                         value="Never",
                         label="Alcohol Consumption",
                         info="Important for dietary planning"
                     )
 
                     gr.HTML('<div class="section-header">📍 Location & Demographics</div>')
-                    state_input = gr.Dropdown(choices=state_options, value="Maharashtra", label="State")
-                    residence_input = gr.Radio(choices=["Urban", "Rural"], value="Urban", label="Residence Type")
+                    state_input = gr.Dropdown(choices=STATE_OPTIONS, value="Maharashtra", label="State")
+                    residence_input = gr.Radio(choices=RESIDENCE_CHOICES, value="Urban", label="Residence Type")
                     wealth_input = gr.Dropdown(
-                        choices=["Poorest", "Poorer", "Middle", "Richer", "Richest"],
+                        choices=WEALTH_CHOICES,
                         value="Middle",
                         label="Socioeconomic Status"
                     )
@@ -671,40 +952,16 @@ class ModernGradioInterface:
             # Event handlers
             def update_bmi_display(weight, height_cm):
                 """Update BMI when weight or height changes with color coding"""
-                try:
-                    if not weight or not height_cm:
-                        return """<div style="padding: 15px; text-align: center; border-radius: 8px; background: #f1f5f9;">
-                        <div style="font-size: 28px; font-weight: bold; color: #94a3b8;">0.00</div>
-                        <div style="font-size: 14px; color: #64748b;">Invalid</div></div>"""
-
-                    bmi, category = self.calculate_bmi(weight, height_cm)
-
-                    # Color coding: Green (Normal), Yellow (Overweight), Red (Obese), Gray (Underweight)
-                    if category == "Normal":
-                        bg_color = "#dcfce7"
-                        text_color = "#166534"
-                        icon = "✅"
-                    elif category == "Overweight":
-                        bg_color = "#fef9c3"
-                        text_color = "#854d0e"
-                        icon = "⚠️"
-                    elif category == "Obese":
-                        bg_color = "#fee2e2"
-                        text_color = "#991b1b"
-                        icon = "🔴"
-                    else:  # Underweight
-                        bg_color = "#e0e7ff"
-                        text_color = "#3730a3"
-                        icon = "ℹ️"
-
-                    return f"""<div style="padding: 15px; text-align: center; border-radius: 8px; background: {bg_color};">
-                    <div style="font-size: 32px; font-weight: bold; color: {text_color};">{bmi}</div>
-                    <div style="font-size: 16px; color: {text_color}; margin-top: 5px;">{icon} {category}</div>
-                    </div>"""
-                except:
-                    return """<div style="padding: 15px; text-align: center; border-radius: 8px; background: #f1f5f9;">
-                    <div style="font-size: 28px; font-weight: bold; color: #94a3b8;">0.00</div>
-                    <div style="font-size: 14px; color: #64748b;">Invalid</div></div>"""
+                # calculate_bmi already handles None/empty/garbage input and
+                # returns "Invalid", which falls through _BMI_STYLES.get
+                bmi, category = self.calculate_bmi(weight, height_cm)
+                style = _BMI_STYLES.get(category)
+                if style is None:
+                    return BMI_INVALID_HTML
+                bg_color, text_color, icon = style
+                return _BMI_HTML_FMT.format(
+                    bg=bg_color, fg=text_color, bmi=bmi, icon=icon, category=category
+                )
 
             def update_from_cm(height_cm):
                 """Update feet/inches when cm changes"""
@@ -724,39 +981,47 @@ class ModernGradioInterface:
                 except:
                     return 160
 
-            # Wire up conversions
+            def _on_height_change(feet, inches, weight):
+                """Sync cm and BMI from one feet/inches edit"""
+                cm = update_from_feet(feet, inches)
+                return cm, update_bmi_display(weight, cm)
+
+            # Wire up conversions and BMI refresh. Each height input gets a
+            # single handler returning both outputs: previously feet/inches
+            # were wired twice (once for cm, once for BMI), so every edit
+            # fired two callbacks, ran the conversion twice and cost an
+            # extra round-trip. trigger_mode="always_last" coalesces
+            # keystroke storms so only the settled value reaches Python
+            # instead of one callback per digit or arrow-key press.
             feet_input.change(
-                fn=update_from_feet,
-                inputs=[feet_input, inches_input],
-                outputs=[height_cm_input]
+                fn=_on_height_change,
+                inputs=[feet_input, inches_input, weight_input],
+                outputs=[height_cm_input, bmi_display],
+                show_progress="hidden",
+                trigger_mode="always_last"
             )
 
             inches_input.change(
-                fn=update_from_feet,
-                inputs=[feet_input, inches_input],
-                outputs=[height_cm_input]
+                fn=_on_height_change,
+                inputs=[feet_input, inches_input, weight_input],
+                outputs=[height_cm_input, bmi_display],
+                show_progress="hidden",
+                trigger_mode="always_last"
             )
 
-            # Update BMI when values change
             weight_input.change(
                 fn=update_bmi_display,
                 inputs=[weight_input, height_cm_input],
-                outputs=[bmi_display]
-            )
-
-            feet_input.change(
-                fn=lambda f, i, w: update_bmi_display(w, update_from_feet(f, i)),
-                inputs=[feet_input, inches_input, weight_input],
-                outputs=[bmi_display]
-            )
-
-            inches_input.change(
-                fn=lambda f, i, w: update_bmi_display(w, update_from_feet(f, i)),
-                inputs=[feet_input, inches_input, weight_input],
-                outputs=[bmi_display]
+                outputs=[bmi_display],
+                show_progress="hidden",
+                trigger_mode="always_last"
             )
 
-            # Generate treatment with auto-scroll to output area
+            # Generate treatment with auto-scroll to output area.
+            # The streaming generator shows the loading card immediately
+            # and live agent logs during the 1-3 minute run; concurrent
+            # submissions still overlap via _CREW_EXECUTOR's workers
+            # (Gradio cannot batch a generator handler)
             generate_btn.click(
                 fn=self.generate_treatment_plan,
                 inputs=[name_input, age_input, gender_input, height_cm_input, weight_input, diet_preference,
@@ -781,9 +1046,17 @@ class ModernGradioInterface:
 
             # Load random patient
             def load_random():
-                if self.data_loader is None:
-                    self.data_loader = PatientDataLoader()
-                patient = self.data_loader.get_random_patient()
+                # Share the warmed loader rather than parsing the CSV a
+                # second time for this button
+                self._ensure_initialized()
+                if self._sample_pool:
+                    patient = self._sample_pool.popleft()
+                else:
+                    patient = self.data_loader.get_random_patient()
+                # Top the pool back up so every click serves a fresh
+                # sample instead of cycling the warm-up batch forever;
+                # a random pick is a cheap integer draw on the loader
+                self._sample_pool.append(self.data_loader.get_random_patient())
                 bmi, category = self.calculate_bmi(patient['weight_kg'], patient['height_cm'])
                 feet, inches = self.cm_to_feet_inches(patient['height_cm'])
 
@@ -3,6 +3,9 @@ Obesity Treatment Multi-Agent Crew
 Complete system with 5 specialized agents working together
 """
 
+import asyncio
+import collections
+
 from crewai import Crew, Process
 from agents import (
     create_data_analyst_agent,
@@ -11,20 +14,38 @@ from agents import (
     create_fitness_trainer_agent,
     create_care_coordinator_agent
 )
+from agents._factory import get_default_llm, _MODEL, _TEMPERATURE
 from tasks.all_tasks import (
     create_analysis_task,
     create_diet_plan_task,
     create_medical_evaluation_task,
     create_fitness_plan_task,
+    create_combined_specialist_task,
     create_coordination_task
 )
 from tools.patient_data_tool import PatientDataLoader, get_random_patient
+from tools.semantic_cache import SemanticPlanCache
 from dotenv import load_dotenv
+import json
 import os
+import sys
+import time
 
 # Load environment variables
 load_dotenv()
 
+# Per-patient summary printed once per plan; missing fields render as
+# 'Unknown' via a defaultdict instead of five .get() lookups. BMI is
+# pre-formatted before format_map — a numeric format spec here would
+# raise on the defaultdict's 'Unknown' fallback
+_HEADER_TPL = (
+    "Patient ID: {patient_id}\n"
+    "Age: {age} years\n"
+    "BMI: {bmi} ({bmi_category})\n"
+    "Location: {location_context}\n"
+    "Wealth Index: {wealth_index}"
+)
+
 
 class ObesityTreatmentCrew:
     """
@@ -32,123 +53,424 @@ class ObesityTreatmentCrew:
     Agents: Data Analyst, Dietician, Medical Advisor, Fitness Trainer, Care Coordinator
     """
 
-    def __init__(self):
-        """Initialize all agents"""
+    def __init__(self, verbose=True):
+        """Initialize all agents
+
+        Args:
+            verbose: When False, suppresses progress prints here and in
+                     CrewAI's own logging — batch sweeps over many
+                     patients shouldn't pay for stdout formatting/flushes
+        """
         # Verify API key
         if not os.getenv("OPENAI_API_KEY"):
             raise ValueError(
                 "OPENAI_API_KEY not found. Please create .env file with your API key."
             )
 
-        print("\n" + "="*60)
-        print("INITIALIZING OBESITY TREATMENT MULTI-AGENT SYSTEM")
-        print("="*60 + "\n")
-
-        # Create all agents
-        print("[1/5] Creating Data Analyst Agent...")
-        self.data_analyst = create_data_analyst_agent()
-
-        print("[2/5] Creating Dietician Agent...")
-        self.dietician = create_dietician_agent()
-
-        print("[3/5] Creating Medical Advisor Agent...")
-        self.medical_advisor = create_medical_advisor_agent()
+        self.verbose = verbose
+        self._log = print if verbose else (lambda *args, **kwargs: None)
+
+        self._log("\n" + "="*60)
+        self._log("INITIALIZING OBESITY TREATMENT MULTI-AGENT SYSTEM")
+        self._log("="*60 + "\n")
+
+        # Create all agents concurrently; any I/O a factory does (config
+        # read, client setup) overlaps instead of stacking serially. The
+        # shared LLM is built once up front so the factories don't race
+        # its cached constructor.
+        self._log("Creating all 5 agents in parallel...")
+        llm = get_default_llm()
+        # The coordinator picks its own (cheaper) LLM when none is given
+        factories = (
+            (create_data_analyst_agent, llm),
+            (create_dietician_agent, llm),
+            (create_medical_advisor_agent, llm),
+            (create_fitness_trainer_agent, llm),
+            (create_care_coordinator_agent, None),
+        )
 
-        print("[4/5] Creating Fitness Trainer Agent...")
-        self.fitness_trainer = create_fitness_trainer_agent()
+        async def _build_agents():
+            return await asyncio.gather(
+                *(asyncio.to_thread(factory, agent_llm)
+                  for factory, agent_llm in factories)
+            )
 
-        print("[5/5] Creating Care Coordinator Agent...")
-        self.care_coordinator = create_care_coordinator_agent()
+        (self.data_analyst, self.dietician, self.medical_advisor,
+         self.fitness_trainer, self.care_coordinator) = asyncio.run(_build_agents())
 
-        print("\n[OK] All agents initialized successfully!\n")
+        self._log("\n[OK] All agents initialized successfully!\n")
 
         # Initialize data loader
-        self.data_loader = PatientDataLoader()
+        self.data_loader = PatientDataLoader(verbose=self.verbose)
 
-    def create_treatment_plan(self, patient_data):
+        # Near-identical patients produce near-identical plans; the
+        # semantic cache reuses them instead of re-running five LLM calls
+        self.plan_cache = SemanticPlanCache(verbose=self.verbose)
+
+    def create_treatment_plan(self, patient_data, log_callback=None):
         """
         Create a complete treatment plan for a patient using all agents
 
         Args:
             patient_data: Dictionary containing patient information
+            log_callback: Optional callable receiving progress messages as
+                          each stage completes (used by the UI to show
+                          activity without capturing stdout)
 
         Returns:
             str: Final integrated treatment plan
         """
-        print("\n" + "="*60)
-        print("CREATING COMPREHENSIVE TREATMENT PLAN")
-        print("="*60 + "\n")
+        notify = log_callback if log_callback is not None else (lambda msg: None)
+
+        cached = self.plan_cache.get(patient_data)
+        if cached is not None:
+            notify("[CACHE] Reusing plan generated for a near-identical patient")
+            return cached
+
+        self._log("\n" + "="*60)
+        self._log("CREATING COMPREHENSIVE TREATMENT PLAN")
+        self._log("="*60 + "\n")
+
+        # One write to stdout instead of five per-field prints
+        fields = collections.defaultdict(lambda: 'Unknown', patient_data)
+        bmi = patient_data.get('bmi')
+        fields['bmi'] = f"{bmi:.1f}" if isinstance(bmi, (int, float)) else 'Unknown'
+        self._log(_HEADER_TPL.format_map(fields))
+        self._log("\n" + "-"*60 + "\n")
+
+        # The dependency DAG is a diamond: diet, medical and fitness all
+        # depend only on the analysis; coordination waits for all four.
+        # The scheduler dispatches every task whose dependencies are
+        # satisfied, so independent LLM calls overlap automatically and
+        # adding a new task is a graph entry, not new orchestration code.
+        self._log("Setting up agent tasks...\n")
+        self._log("\nStarting multi-agent collaboration...\n")
+        self._log("="*60)
+
+        results = asyncio.run(self._run_dag(patient_data, notify))
+        notify("[3/3] Treatment plan complete")
+        self._log("="*60 + "\n")
+
+        result = results['coordination']
+        self.plan_cache.set(patient_data, result)
+        return result
 
-        print(f"Patient ID: {patient_data.get('patient_id', 'Unknown')}")
-        print(f"Age: {patient_data.get('age')} years")
-        print(f"BMI: {patient_data.get('bmi'):.1f} ({patient_data.get('bmi_category')})")
-        print(f"Location: {patient_data.get('location_context')}")
-        print(f"Wealth Index: {patient_data.get('wealth_index')}")
-        print("\n" + "-"*60 + "\n")
+    def create_treatment_plan_batched(self, patient_data, log_callback=None):
+        """
+        Create a treatment plan using one combined specialist call
+
+        Same pipeline as create_treatment_plan, but the diet, medical and
+        fitness reports come from a single JSON-structured LLM call, so
+        the patient context and diagnostic report are sent once instead
+        of three times. Falls back to the parallel three-call path if the
+        combined response cannot be parsed.
+        """
+        notify = log_callback if log_callback is not None else (lambda msg: None)
 
-        # Create tasks for all agents
-        print("Setting up agent tasks...\n")
+        cached = self.plan_cache.get(patient_data)
+        if cached is not None:
+            notify("[CACHE] Reusing plan generated for a near-identical patient")
+            return cached
 
-        # Task 1: Data Analysis
+        notify(f"[1/3] Data Analyst examining patient {patient_data.get('patient_id', 'Unknown')}...")
         analysis_task = create_analysis_task(self.data_analyst, patient_data)
+        analysis_report = str(self._run_task(self.data_analyst, analysis_task))
+        notify("[1/3] Diagnostic analysis complete")
 
-        # Task 2: Diet Plan (depends on analysis)
-        diet_task = create_diet_plan_task(self.dietician, patient_data, "{analysis}")
-
-        # Task 3: Medical Evaluation (depends on analysis)
-        medical_task = create_medical_evaluation_task(
-            self.medical_advisor, patient_data, "{analysis}"
+        notify("[2/3] Generating all three specialist reports in one call...")
+        combined_task = create_combined_specialist_task(
+            self.medical_advisor, patient_data, analysis_report
         )
-
-        # Task 4: Fitness Plan (depends on analysis)
-        fitness_task = create_fitness_plan_task(
-            self.fitness_trainer, patient_data, "{analysis}"
+        combined_output = str(self._run_task(self.medical_advisor, combined_task))
+
+        sections = self._parse_combined_output(combined_output)
+        if sections is None:
+            print("[WARNING] Combined specialist output was not valid JSON, "
+                  "falling back to parallel specialist calls")
+            return self.create_treatment_plan(patient_data, log_callback)
+        notify("[2/3] Specialist reports ready")
+
+        coordination_task = create_coordination_task(
+            self.care_coordinator, patient_data,
+            diagnostic_report=analysis_report,
+            diet_plan=sections['diet_plan'],
+            medical_evaluation=sections['medical_evaluation'],
+            fitness_plan=sections['fitness_plan']
         )
+        notify("[3/3] Care Coordinator integrating recommendations...")
+        result = self._run_task(self.care_coordinator, coordination_task)
+        notify("[3/3] Treatment plan complete")
 
-        # Task 5: Treatment Coordination (depends on all previous tasks)
-        coordination_task = create_coordination_task(self.care_coordinator, patient_data)
+        self.plan_cache.set(patient_data, str(result))
+        return result
 
-        # Note: CrewAI 0.1.32+ handles task dependencies automatically
-        # based on the sequential process order. Context is no longer set manually.
+    @staticmethod
+    def _parse_combined_output(text):
+        """Extract the three specialist sections from a JSON response"""
+        stripped = text.strip()
+        # Models often wrap JSON in a fenced code block
+        if stripped.startswith("```"):
+            stripped = stripped.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            sections = json.loads(stripped)
+        except ValueError:
+            return None
+        keys = ('diet_plan', 'medical_evaluation', 'fitness_plan')
+        if not all(isinstance(sections.get(k), str) for k in keys):
+            return None
+        return sections
 
-        # Create crew with all agents and tasks
+    def _run_task(self, agent, task):
+        """Execute a single task with its agent as a one-task crew"""
         crew = Crew(
-            agents=[
-                self.data_analyst,
-                self.dietician,
-                self.medical_advisor,
-                self.fitness_trainer,
-                self.care_coordinator
-            ],
-            tasks=[
-                analysis_task,
-                diet_task,
-                medical_task,
-                fitness_task,
-                coordination_task
-            ],
+            agents=[agent],
+            tasks=[task],
             process=Process.sequential,
-            verbose=True
+            verbose=self.verbose
         )
+        return crew.kickoff()
+
+    # Dependency graph driving _run_dag; each task lists the tasks whose
+    # outputs it consumes
+    _TASK_GRAPH = {
+        'analysis': (),
+        'diet': ('analysis',),
+        'medical': ('analysis',),
+        'fitness': ('analysis',),
+        'coordination': ('analysis', 'diet', 'medical', 'fitness'),
+    }
+
+    # Progress labels streamed to the UI as each task starts/finishes
+    _TASK_LABELS = {
+        'analysis': ("[1/3] Data Analyst examining patient data...",
+                     "[1/3] Diagnostic analysis complete"),
+        'diet': ("[2/3] Dietician drafting the meal plan...",
+                 "[2/3] Diet plan ready"),
+        'medical': ("[2/3] Medical Advisor evaluating clinical needs...",
+                    "[2/3] Medical evaluation ready"),
+        'fitness': ("[2/3] Fitness Trainer building the activity plan...",
+                    "[2/3] Fitness plan ready"),
+        'coordination': ("[3/3] Care Coordinator integrating recommendations...",
+                         "[3/3] Integrated plan drafted"),
+    }
+
+    def _build_task(self, name, patient_data, results):
+        """Construct the (agent, task) pair for one DAG node"""
+        if name == 'analysis':
+            return self.data_analyst, create_analysis_task(
+                self.data_analyst, patient_data
+            )
+        if name == 'diet':
+            return self.dietician, create_diet_plan_task(
+                self.dietician, patient_data, results['analysis']
+            )
+        if name == 'medical':
+            return self.medical_advisor, create_medical_evaluation_task(
+                self.medical_advisor, patient_data, results['analysis']
+            )
+        if name == 'fitness':
+            return self.fitness_trainer, create_fitness_plan_task(
+                self.fitness_trainer, patient_data, results['analysis']
+            )
+        if name == 'coordination':
+            return self.care_coordinator, create_coordination_task(
+                self.care_coordinator, patient_data,
+                diagnostic_report=results['analysis'],
+                diet_plan=results['diet'],
+                medical_evaluation=results['medical'],
+                fitness_plan=results['fitness']
+            )
+        raise ValueError(f"Unknown task: {name}")
 
-        # Execute the crew
-        print("\nStarting multi-agent collaboration...\n")
-        print("="*60)
-        result = crew.kickoff()
-        print("="*60 + "\n")
+    async def _run_dag(self, patient_data, notify, results=None):
+        """
+        Execute the task graph, launching every task whose dependencies
+        are satisfied as soon as they are
 
-        return result
+        This pinned CrewAI release has no kickoff_async, so each sync
+        kickoff runs under asyncio.to_thread; independent tasks (the
+        three specialists) therefore overlap their HTTP waits, and each
+        finished report is pushed through notify the moment it lands.
+
+        Args:
+            results: Optional pre-seeded outputs (e.g. an analysis report
+                     produced offline); those tasks are skipped.
+        """
+        results = {} if results is None else dict(results)
+        pending = set(self._TASK_GRAPH) - set(results)
+        running = {}
+
+        async def run_one(name):
+            agent, task = self._build_task(name, patient_data, results)
+            notify(self._TASK_LABELS[name][0])
+            output = str(await asyncio.to_thread(self._run_task, agent, task))
+            notify(self._TASK_LABELS[name][1])
+            notify(output)
+            return name, output
+
+        while pending or running:
+            ready = [
+                name for name in pending
+                if all(dep in results for dep in self._TASK_GRAPH[name])
+            ]
+            for name in ready:
+                pending.discard(name)
+                running[asyncio.ensure_future(run_one(name))] = name
+            done, _ = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                del running[future]
+                name, output = future.result()
+                results[name] = output
+        return results
+
+    def create_treatment_plans_batch(self, patients, concurrency=8,
+                                     poll_interval=30,
+                                     completion_window='24h'):
+        """
+        Create plans for many patients via the OpenAI Batch API
+
+        Offline path for NFHS bulk sweeps where latency does not matter:
+        every patient's analysis prompt is submitted as one batch job
+        (billed at roughly half the real-time rate), the job is polled
+        until it completes, and each returned analysis is fed through the
+        remaining local diet/medical/fitness/coordination pipeline. Use
+        create_treatment_plan for interactive requests.
+
+        Args:
+            patients: Sequence of patient data dicts
+            concurrency: Cap on simultaneous local pipeline completions
+            poll_interval: Seconds between batch status checks
+            completion_window: Batch API completion window
+
+        Returns:
+            list: Treatment plans, one per patient, in input order
+        """
+        from openai import OpenAI
+
+        client = OpenAI()
+        patients = list(patients)
+
+        lines = []
+        for index, patient in enumerate(patients):
+            task = create_analysis_task(self.data_analyst, patient)
+            lines.append(json.dumps({
+                'custom_id': f'patient-{index}',
+                'method': 'POST',
+                'url': '/v1/chat/completions',
+                'body': {
+                    'model': _MODEL,
+                    'temperature': _TEMPERATURE,
+                    'messages': [{
+                        'role': 'user',
+                        'content': (f"{task.description}\n\n"
+                                    f"Expected output:\n{task.expected_output}"),
+                    }],
+                },
+            }))
+
+        upload = client.files.create(
+            file=('analysis_batch.jsonl', '\n'.join(lines).encode('utf-8')),
+            purpose='batch'
+        )
+        batch = client.batches.create(
+            input_file_id=upload.id,
+            endpoint='/v1/chat/completions',
+            completion_window=completion_window
+        )
+        self._log(f"[OK] Submitted analysis batch {batch.id} "
+                  f"({len(patients)} patients)")
+
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
+
+        if batch.status != 'completed':
+            raise RuntimeError(
+                f"Analysis batch {batch.id} ended with status: {batch.status}"
+            )
+
+        analyses = {}
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            record = json.loads(line)
+            body = record['response']['body']
+            analyses[record['custom_id']] = \
+                body['choices'][0]['message']['content']
+
+        sem = asyncio.Semaphore(concurrency)
+
+        async def finish(index, patient):
+            async with sem:
+                results = await self._run_dag(
+                    patient, lambda msg: None,
+                    results={'analysis': analyses[f'patient-{index}']}
+                )
+            plan = results['coordination']
+            self.plan_cache.set(patient, plan)
+            return plan
+
+        async def finish_all():
+            return await asyncio.gather(
+                *(finish(i, p) for i, p in enumerate(patients))
+            )
+
+        return asyncio.run(finish_all())
+
+    async def analyze_patients_batch(self, patients, concurrency=8,
+                                     output_file=None):
+        """
+        Create treatment plans for many patients with bounded concurrency
+
+        Fans create_treatment_plan out across worker threads, holding at
+        most `concurrency` plans in flight so dataset-scale sweeps stay
+        inside OpenAI rate limits. Results come back in input order; when
+        output_file is given, each plan is also appended to it as one
+        NDJSON line so a 1000-patient run does a single open() instead of
+        one file per patient.
+
+        Args:
+            patients: Iterable of patient data dicts
+            concurrency: Maximum number of plans generated at once
+            output_file: Optional path for NDJSON results
+
+        Returns:
+            list: Treatment plans, one per patient, in input order
+        """
+        # Materialize once: patients is iterated for gather and again
+        # for the NDJSON zip, which would drain a generator input
+        patients = list(patients)
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(patient):
+            async with sem:
+                return await asyncio.to_thread(
+                    self.create_treatment_plan, patient
+                )
+
+        results = await asyncio.gather(*(one(p) for p in patients))
+
+        if output_file is not None:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                for patient, plan in zip(patients, results):
+                    f.write(json.dumps({
+                        'patient_id': patient.get('patient_id'),
+                        'plan': str(plan),
+                    }) + '\n')
+            self._log(f"[OK] {len(results)} treatment plans saved to: {output_file}")
+
+        return results
 
     def analyze_random_patient(self):
         """Analyze a random patient from the NFHS dataset"""
-        print("\nFetching random patient from NFHS dataset...")
+        self._log("\nFetching random patient from NFHS dataset...")
         patient = self.data_loader.get_random_patient()
         return self.create_treatment_plan(patient)
 
     def analyze_patient_by_criteria(self, state=None, residence_type=None,
                                     bmi_category=None, wealth_index=None):
         """Analyze a patient matching specific criteria"""
-        print(f"\nSearching for patient: State={state}, Residence={residence_type}, "
+        self._log(f"\nSearching for patient: State={state}, Residence={residence_type}, "
               f"BMI Category={bmi_category}, Wealth={wealth_index}")
 
         patients = self.data_loader.get_patients_by_criteria(
@@ -160,7 +482,7 @@ class ObesityTreatmentCrew:
         )
 
         if not patients:
-            print("No patients found matching criteria")
+            self._log("No patients found matching criteria")
             return None
 
         patient = patients[0]
@@ -169,6 +491,14 @@ class ObesityTreatmentCrew:
 
 def main():
     """Main function to test the complete system"""
+    # Reconfigure stdout once instead of re-encoding every large plan
+    # inside a per-print UnicodeEncodeError handler (Windows cp1252)
+    try:
+        sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+    except AttributeError:
+        # Pre-3.7 stdout wrapper; keep whatever encoding it has
+        pass
+
     try:
         # Create the crew
         crew = ObesityTreatmentCrew()
@@ -191,14 +521,7 @@ def main():
             f.write(str(result))
         print(f"[OK] Treatment plan saved to: {output_file}")
 
-        # Handle Unicode output for Windows console
-        try:
-            print(result)
-        except UnicodeEncodeError:
-            # Fallback: encode to ASCII with replacement for special chars
-            print(str(result).encode('ascii', 'replace').decode('ascii'))
-            print(f"\n[NOTE] Some special characters couldn't be displayed.")
-            print(f"       View the full plan with proper formatting in: {output_file}")
+        print(result)
 
         # Option 2: Specific criteria (commented out - uncomment to use)
         # print("\n\nOPTION: Analyzing specific patient type...")
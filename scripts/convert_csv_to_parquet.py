@@ -0,0 +1,33 @@
+"""
+Convert the NFHS CSV dataset to Parquet
+
+One-shot build step: `python scripts/convert_csv_to_parquet.py` writes
+data/indian_obesity_data_clean.parquet next to the CSV. PatientDataLoader
+prefers the Parquet file when it exists, which loads several times faster
+than re-parsing the CSV on every process start. Requires pyarrow.
+"""
+
+import os
+
+import pandas as pd
+
+# Low-cardinality columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = ('State', 'Urban_Rural', 'BMI_Category', 'Wealth_Index')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+CSV_PATH = os.path.join(DATA_DIR, 'indian_obesity_data_clean.csv')
+PARQUET_PATH = os.path.splitext(CSV_PATH)[0] + '.parquet'
+
+
+def main():
+    df = pd.read_csv(CSV_PATH)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    df.to_parquet(PARQUET_PATH, index=False)
+    print(f"[OK] Converted {len(df):,} records: {CSV_PATH} -> {PARQUET_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,34 +4,102 @@ Centralized task creation for all agents
 """
 
 from crewai import Task
+import functools
+import pickle
+import string
 import yaml
 import os
 
+_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'tasks.yaml')
 
+# libyaml's C loader parses several times faster when the extension is
+# compiled in; fall back to the pure-Python loader otherwise
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@functools.lru_cache(maxsize=1)
 def load_tasks_config():
-    """Load all task configurations from YAML file"""
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'tasks.yaml')
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
+    """
+    Load all task configurations, preferring a pickled sidecar
+
+    The YAML is static, so it is parsed once per process; a `.pkl`
+    sidecar (same scheme as the agents config loader) makes cold starts
+    a pickle load instead of a YAML parse, and is rebuilt whenever it is
+    missing or older than tasks.yaml.
+    """
+    pkl_path = _CONFIG_PATH + '.pkl'
+    try:
+        if os.path.getmtime(pkl_path) >= os.path.getmtime(_CONFIG_PATH):
+            with open(pkl_path, 'rb') as file:
+                return pickle.load(file)
+    except (OSError, pickle.UnpicklingError):
+        pass
+
+    with open(_CONFIG_PATH, 'r') as file:
+        config = yaml.load(file, Loader=_YAML_LOADER)
+
+    try:
+        with open(pkl_path, 'wb') as file:
+            pickle.dump(config, file, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        # Read-only deployment; just serve the parsed YAML
+        pass
+
     return config
 
 
-def format_patient_data(data):
-    """Format patient data into a readable string"""
+@functools.lru_cache(maxsize=None)
+def _description_template(name):
+    """Parse one task's description template into (literal, field) pairs
+
+    str.format reparses the template text on every call; parsing once
+    with string.Formatter reduces each render to list appends + join.
+    The yaml templates use plain {field} placeholders, so conversions
+    and format specs are not handled.
+    """
+    parsed = string.Formatter().parse(load_tasks_config()[name]['description'])
+    return tuple((literal, field) for literal, field, _, _ in parsed)
+
+
+def _render_description(name, **values):
+    """Fill a precompiled description template"""
+    parts = []
+    for literal, field in _description_template(name):
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(values[field]))
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=128)
+def _format_patient_items(items):
+    """Render a tuple of (key, value) pairs as the task data block"""
     formatted = []
-    for key, value in data.items():
+    for key, value in items:
         formatted_key = key.replace('_', ' ').title()
         formatted.append(f"- {formatted_key}: {value}")
     return "\n    ".join(formatted)
 
 
+def format_patient_data(data):
+    """Format patient data into a readable string
+
+    The same dict is formatted for all five tasks of one treatment plan,
+    so the result is memoized on the (hashable) item tuple and the
+    title-casing loop runs once per patient instead of five times.
+    """
+    return _format_patient_items(tuple(data.items()))
+
+
 def create_analysis_task(agent, patient_data):
     """Create data analysis task"""
     config = load_tasks_config()['analyze_patient_data']
     formatted_data = format_patient_data(patient_data)
 
     return Task(
-        description=config['description'].format(patient_data=formatted_data),
+        description=_render_description(
+            'analyze_patient_data', patient_data=formatted_data
+        ),
         expected_output=config['expected_output'],
         agent=agent
     )
@@ -43,7 +111,8 @@ def create_diet_plan_task(agent, patient_data, diagnostic_report):
     formatted_data = format_patient_data(patient_data)
 
     return Task(
-        description=config['description'].format(
+        description=_render_description(
+            'create_diet_plan',
             patient_data=formatted_data,
             diagnostic_report=diagnostic_report
         ),
@@ -58,7 +127,8 @@ def create_medical_evaluation_task(agent, patient_data, diagnostic_report):
     formatted_data = format_patient_data(patient_data)
 
     return Task(
-        description=config['description'].format(
+        description=_render_description(
+            'evaluate_medical_needs',
             patient_data=formatted_data,
             diagnostic_report=diagnostic_report
         ),
@@ -73,7 +143,8 @@ def create_fitness_plan_task(agent, patient_data, diagnostic_report):
     formatted_data = format_patient_data(patient_data)
 
     return Task(
-        description=config['description'].format(
+        description=_render_description(
+            'create_fitness_plan',
             patient_data=formatted_data,
             diagnostic_report=diagnostic_report
         ),
@@ -82,20 +153,66 @@ def create_fitness_plan_task(agent, patient_data, diagnostic_report):
     )
 
 
-def create_coordination_task(agent, patient_data):
+def create_combined_specialist_task(agent, patient_data, diagnostic_report):
+    """Create one task covering diet, medical and fitness planning
+
+    Shares a single copy of the patient context and diagnostic report
+    across all three specialist briefs instead of sending three prompts,
+    trading three short generations for one longer one.
+    """
+    config = load_tasks_config()
+    formatted_data = format_patient_data(patient_data)
+
+    briefs = "\n\n".join(
+        f"### {label}\n{config[key]['expected_output']}"
+        for key, label in (
+            ('create_diet_plan', 'diet_plan'),
+            ('evaluate_medical_needs', 'medical_evaluation'),
+            ('create_fitness_plan', 'fitness_plan'),
+        )
+    )
+
+    description = (
+        "Acting as dietician, medical advisor and fitness trainer in one "
+        "pass, produce all three specialist reports for this patient.\n\n"
+        f"Patient Data:\n    {formatted_data}\n\n"
+        f"Diagnostic Report:\n{diagnostic_report}\n\n"
+        "Respond with a single JSON object with exactly three string keys: "
+        "\"diet_plan\", \"medical_evaluation\" and \"fitness_plan\". "
+        "Each value must satisfy the corresponding brief below.\n\n"
+        f"{briefs}"
+    )
+
+    return Task(
+        description=description,
+        expected_output=(
+            "A JSON object with the keys diet_plan, medical_evaluation and "
+            "fitness_plan, each containing the full specialist report"
+        ),
+        agent=agent
+    )
+
+
+def create_coordination_task(agent, patient_data,
+                             diagnostic_report="{diagnostic_report}",
+                             diet_plan="{diet_plan}",
+                             medical_evaluation="{medical_evaluation}",
+                             fitness_plan="{fitness_plan}"):
     """Create treatment coordination task"""
     config = load_tasks_config()['coordinate_treatment_plan']
     formatted_data = format_patient_data(patient_data)
 
-    # Note: The specialist recommendations will be automatically provided
-    # by CrewAI from previous tasks
+    # When the specialist outputs are passed in (parallel crew execution),
+    # they are embedded directly; otherwise CrewAI fills the placeholders
+    # from previous tasks in a sequential process.
     return Task(
-        description=config['description'].format(
+        description=_render_description(
+            'coordinate_treatment_plan',
             patient_data=formatted_data,
-            diagnostic_report="{diagnostic_report}",
-            diet_plan="{diet_plan}",
-            medical_evaluation="{medical_evaluation}",
-            fitness_plan="{fitness_plan}"
+            diagnostic_report=diagnostic_report,
+            diet_plan=diet_plan,
+            medical_evaluation=medical_evaluation,
+            fitness_plan=fitness_plan
         ),
         expected_output=config['expected_output'],
         agent=agent
@@ -4,16 +4,13 @@ Defines the task for analyzing patient obesity data
 """
 
 from crewai import Task
-import yaml
-import os
+
+from .all_tasks import load_tasks_config, format_patient_data, _render_description
 
 
 def load_task_config():
-    """Load task configuration from YAML file"""
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'tasks.yaml')
-    with open(config_path, 'r') as file:
-        config = yaml.safe_load(file)
-    return config['analyze_patient_data']
+    """Load task configuration from the shared cached parse"""
+    return load_tasks_config()['analyze_patient_data']
 
 
 def create_data_analysis_task(agent, patient_data):
@@ -35,7 +32,9 @@ def create_data_analysis_task(agent, patient_data):
 
     # Create task
     task = Task(
-        description=config['description'].format(patient_data=formatted_data),
+        description=_render_description(
+            'analyze_patient_data', patient_data=formatted_data
+        ),
         expected_output=config['expected_output'],
         agent=agent
     )
@@ -43,25 +42,6 @@ def create_data_analysis_task(agent, patient_data):
     return task
 
 
-def format_patient_data(data):
-    """
-    Format patient data into a readable string
-
-    Args:
-        data: Dictionary containing patient information
-
-    Returns:
-        str: Formatted patient data string
-    """
-    formatted = []
-    for key, value in data.items():
-        # Convert key from snake_case to Title Case
-        formatted_key = key.replace('_', ' ').title()
-        formatted.append(f"- {formatted_key}: {value}")
-
-    return "\n    ".join(formatted)
-
-
 if __name__ == "__main__":
     # Test task creation
     from agents.data_analyst_agent import create_data_analyst_agent
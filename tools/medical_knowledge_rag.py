@@ -8,82 +8,392 @@ from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.document_loaders import TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+import functools
+import hashlib
+import itertools
+import numpy as np
 import os
+import pickle
+import torch
 from typing import List, Dict
 
+# Use every core for CPU-bound MiniLM forward passes
+torch.set_num_threads(os.cpu_count())
+
+# Works both as a package module and as a flat import (rag_tool path hack)
+try:
+    from .onnx_embeddings import (
+        CachedQueryEmbeddings, accelerate_cpu_model, get_onnx_embeddings
+    )
+except ImportError:
+    from onnx_embeddings import (
+        CachedQueryEmbeddings, accelerate_cpu_model, get_onnx_embeddings
+    )
+
+
+def _load_st_embeddings():
+    """Build the stock sentence-transformers MiniLM embedder
+
+    On GPU the model runs in FP16 (about 2x faster forward passes) with
+    bigger batches; encode's numpy conversion upcasts vectors back to
+    FP32 before they reach Chroma's HNSW index, which stores FP32.
+    """
+    if torch.cuda.is_available():
+        embeddings = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/all-MiniLM-L6-v2",
+            model_kwargs={"device": "cuda"},
+            encode_kwargs={"batch_size": 256, "normalize_embeddings": True,
+                           "convert_to_numpy": True}
+        )
+        embeddings.client = embeddings.client.half()
+        return embeddings
+
+    embeddings = HuggingFaceEmbeddings(
+        model_name="sentence-transformers/all-MiniLM-L6-v2",
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"batch_size": 64, "normalize_embeddings": True}
+    )
+    embeddings.client = accelerate_cpu_model(embeddings.client)
+    return embeddings
+
+# ChromaDB's recommended insert batch range is 100-250; batching keeps
+# per-record SQLite/HNSW transaction overhead off the indexing path
+_INSERT_BATCH_SIZE = 200
+
+# One shared splitter instead of a fresh instance (and separator rewalk
+# setup) per call site. Parent chunks (1000 chars) carry the context
+# handed to the LLM; the small child chunks below are what gets embedded
+# and searched, so retrieval stays precise (a 1000-char span can mix
+# sub-topics like two different medications) while prompts stay rich.
+_MED_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""],
+    is_separator_regex=False,
+)
+
+_CHILD_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=300,
+    chunk_overlap=50,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""],
+    is_separator_regex=False,
+)
+
+
+def _add_in_batches(vectorstore, documents, batch_size=_INSERT_BATCH_SIZE):
+    """Insert documents into a vector store in fixed-size batches"""
+    doc_iter = iter(documents)
+    while True:
+        batch = list(itertools.islice(doc_iter, batch_size))
+        if not batch:
+            break
+        vectorstore.add_documents(batch)
+
+
+def _chroma_scores_to_similarity(vectorstore, results):
+    """Convert Chroma's distances to cosine similarity, space-aware
+
+    collection_metadata only applies when a collection is created, so a
+    legacy collection built before the cosine setting keeps Chroma's
+    default l2 space and reports *squared* L2 distances. All embedding
+    backends here L2-normalize, so d^2 = 2 - 2*cos and cosine is
+    recovered as 1 - d^2/2; cosine and ip spaces both report
+    1 - similarity and invert directly.
+    """
+    metadata = getattr(vectorstore._collection, "metadata", None) or {}
+    space = metadata.get("hnsw:space", "l2")
+    if space == "l2":
+        return [(doc, 1.0 - score / 2.0) for doc, score in results]
+    return [(doc, 1.0 - score) for doc, score in results]
+
+
+class InMemoryMedicalStore:
+    """Brute-force cosine search over the tiny static medical corpus
+
+    The knowledge base is ~30 chunks; an HNSW index plus SQLite is pure
+    overhead at that scale. A single normalized [n_chunks, dim] matrix
+    dot product ranks every chunk in microseconds, and the matrix can
+    be memory-mapped straight off disk. Mirrors the vector-store search
+    API so callers don't care which backend they got.
+    """
+
+    def __init__(self, vectors, documents, embeddings):
+        self.vectors = np.asarray(vectors, dtype=np.float32)
+        self.documents = documents
+        self.embeddings = embeddings
+
+    def similarity_search_with_score(self, query, k=5):
+        """Return (document, cosine similarity) pairs, best first"""
+        q = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm > 0:
+            q = q / norm
+        scores = self.vectors @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.documents[i], float(scores[i])) for i in top]
+
+    def similarity_search(self, query, k=5):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def add_documents(self, documents):
+        """Embed and append documents to the in-memory matrix
+
+        vstack copies the matrix, which also detaches it from the
+        read-only memory map produced by load_existing_vectorstore.
+        """
+        if not documents:
+            return
+        new = np.asarray(
+            self.embeddings.embed_documents(
+                [doc.page_content for doc in documents]
+            ),
+            dtype=np.float32,
+        )
+        norms = np.linalg.norm(new, axis=1, keepdims=True)
+        new = new / np.where(norms > 0, norms, 1.0)
+        self.vectors = np.vstack([self.vectors, new])
+        self.documents = list(self.documents) + list(documents)
+
+    def similarity_search_batch(self, queries, k=5):
+        """Search several queries in one pass
+
+        All queries go through the embedder as a single batch and are
+        ranked with one [n_queries, dim] x [dim, n_chunks] matrix
+        product, so per-query model and dispatch overhead is paid once.
+        Returns one result list (best first) per query, in order.
+        """
+        q = np.asarray(self.embeddings.embed_documents(list(queries)),
+                       dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        q = q / np.where(norms > 0, norms, 1.0)
+        scores = q @ self.vectors.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row_scores, row_top in zip(scores, top):
+            row_top = row_top[np.argsort(-row_scores[row_top])]
+            results.append([self.documents[i] for i in row_top])
+        return results
+
 
 class MedicalKnowledgeRAG:
     """RAG system for medical knowledge retrieval"""
 
-    def __init__(self, persist_directory: str = "./chroma_db"):
-        """Initialize the RAG system with ChromaDB vector store"""
-        self.persist_directory = persist_directory
+    def __init__(self, persist_directory: str = "./chroma_db",
+                 quantized: bool = True):
+        """Initialize the RAG system with ChromaDB vector store
 
-        # Use sentence-transformers for embeddings
-        print("Loading sentence-transformers model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        Args:
+            persist_directory: ChromaDB storage directory
+            quantized: Use the INT8 ONNX embedder when available; set
+                       False to validate retrieval against FP32
+        """
+        self.persist_directory = persist_directory
+        self.quantized = quantized
 
         # Initialize ChromaDB
         self.vectorstore = None
 
+        # parent_id -> parent chunk content, loaded lazily from disk
+        self._parents = None
+
+    @functools.cached_property
+    def embeddings(self):
+        """Embedding backend, built lazily on first use
+
+        Loading MiniLM costs seconds and ~90MB; deferring it keeps
+        construction instant for callers that never touch embeddings.
+        ONNX Runtime serves the model 2-4x faster on CPU when optimum is
+        installed, otherwise the stock sentence-transformers backend is
+        used; either way repeated queries hit an LRU cache instead of
+        re-running the model.
+        """
+        embeddings = get_onnx_embeddings(batch_size=64, quantized=self.quantized)
+        if embeddings is None:
+            print("Loading sentence-transformers model...")
+            embeddings = _load_st_embeddings()
+        return CachedQueryEmbeddings(embeddings)
+
     def create_medical_knowledge_base(self):
         """Create vector store with medical knowledge documents"""
 
         # Medical knowledge documents for obesity treatment
         medical_docs = self._get_medical_documents()
 
-        # Split documents into chunks
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-
-        splits = text_splitter.split_documents(medical_docs)
-
-        print(f"Creating vector store with {len(splits)} document chunks...")
-
-        # Create vector store
-        self.vectorstore = Chroma.from_documents(
-            documents=splits,
-            embedding=self.embeddings,
-            collection_name="medical_knowledge",
-            persist_directory=self.persist_directory
-        )
-
+        # Small-to-big chunking: embed/search 300-char children, hand
+        # their 1000-char parents to the LLM. Parent ids are content
+        # hashes so they stay stable across rebuilds.
+        parents = _MED_SPLITTER.split_documents(medical_docs)
+        self._parents = {}
+        splits = []
+        for parent in parents:
+            parent_id = hashlib.sha256(
+                parent.page_content.encode('utf-8')
+            ).hexdigest()[:16]
+            self._parents[parent_id] = parent.page_content
+            for child in _CHILD_SPLITTER.split_documents([parent]):
+                child.metadata = dict(child.metadata)
+                child.metadata["parent_id"] = parent_id
+                splits.append(child)
+
+        os.makedirs(self.persist_directory, exist_ok=True)
+        try:
+            with open(self._parents_path, 'wb') as f:
+                pickle.dump(self._parents, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass
+
+        print(f"Creating vector store with {len(splits)} document chunks "
+              f"({len(parents)} parents)...")
+
+        # The medical corpus is frozen at code-edit time, so chunk
+        # embeddings are cached on disk keyed by content hash; rebuilds
+        # only embed chunks whose text actually changed.
+        cache_path = os.path.join(self.persist_directory, "med_embed_cache.pkl")
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except (OSError, pickle.UnpicklingError):
+            cache = {}
+
+        chunks = {}
+        for doc in splits:
+            key = hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()
+            chunks.setdefault(key, doc)
+
+        missing = [key for key in chunks if key not in cache]
+        if missing:
+            vectors = self.embeddings.embed_documents(
+                [chunks[key].page_content for key in missing]
+            )
+            cache.update(zip(missing, vectors))
+            try:
+                with open(cache_path, 'wb') as f:
+                    pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass
+        print(f"Embedded {len(missing)} chunks "
+              f"({len(chunks) - len(missing)} from cache)")
+
+        # ~30 chunks don't justify HNSW+SQLite: keep a normalized FP32
+        # matrix plus the chunk texts, persisted as .npy (memory-mapped
+        # on reload) and a pickle
+        ids = list(chunks)
+        vectors = np.asarray([cache[key] for key in ids], dtype=np.float32)
+        docs = [chunks[key] for key in ids]
+        try:
+            np.save(self._vectors_path, vectors)
+            with open(self._docs_path, 'wb') as f:
+                pickle.dump(
+                    [(doc.page_content, doc.metadata) for doc in docs],
+                    f, protocol=pickle.HIGHEST_PROTOCOL
+                )
+        except OSError:
+            pass
+
+        self.vectorstore = InMemoryMedicalStore(vectors, docs, self.embeddings)
         print(f"Vector store created successfully at {self.persist_directory}")
         return self.vectorstore
 
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.persist_directory, "med_vectors.npy")
+
+    @property
+    def _docs_path(self) -> str:
+        return os.path.join(self.persist_directory, "med_docs.pkl")
+
     def load_existing_vectorstore(self):
-        """Load existing vector store from disk"""
+        """Load existing vector store from disk
+
+        Prefers the memory-mapped numpy store; falls back to a legacy
+        ChromaDB collection written by earlier versions.
+        """
         if not os.path.exists(self.persist_directory):
             raise FileNotFoundError(f"No vector store found at {self.persist_directory}")
 
+        if os.path.exists(self._vectors_path) and os.path.exists(self._docs_path):
+            vectors = np.load(self._vectors_path, mmap_mode="r")
+            with open(self._docs_path, 'rb') as f:
+                docs = [
+                    Document(page_content=content, metadata=metadata)
+                    for content, metadata in pickle.load(f)
+                ]
+            self.vectorstore = InMemoryMedicalStore(vectors, docs, self.embeddings)
+            print("Loaded existing vector store (in-memory)")
+            return self.vectorstore
+
         self.vectorstore = Chroma(
             collection_name="medical_knowledge",
             embedding_function=self.embeddings,
-            persist_directory=self.persist_directory
+            persist_directory=self.persist_directory,
+            collection_metadata={"hnsw:space": "cosine"}
         )
 
         print("Loaded existing vector store")
         return self.vectorstore
 
+    @property
+    def _parents_path(self) -> str:
+        return os.path.join(self.persist_directory, "med_parents.pkl")
+
+    def get_parent_content(self, doc: Document) -> str:
+        """Return the parent chunk for a retrieved child document
+
+        Falls back to the child's own text for documents indexed before
+        parent-child chunking (or custom additions without a parent).
+        """
+        if self._parents is None:
+            try:
+                with open(self._parents_path, 'rb') as f:
+                    self._parents = pickle.load(f)
+            except (OSError, pickle.UnpicklingError):
+                self._parents = {}
+
+        parent_id = doc.metadata.get("parent_id")
+        return self._parents.get(parent_id, doc.page_content)
+
     def query_medical_knowledge(self, query: str, k: int = 5) -> List[Document]:
-        """Query the medical knowledge base"""
+        """Query the medical knowledge base (returns child chunks)"""
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized. Call create_medical_knowledge_base() or load_existing_vectorstore() first")
 
         results = self.vectorstore.similarity_search(query, k=k)
         return results
 
+    def query_medical_knowledge_batch(self, queries: List[str], k: int = 5) -> List[List[Document]]:
+        """Query the knowledge base for several queries at once
+
+        The in-memory store embeds all queries in one batched forward
+        pass; the legacy Chroma backend falls back to per-query search.
+        Returns one child-chunk list per query, in order.
+        """
+        if self.vectorstore is None:
+            raise ValueError("Vector store not initialized. Call create_medical_knowledge_base() or load_existing_vectorstore() first")
+
+        if isinstance(self.vectorstore, InMemoryMedicalStore):
+            return self.vectorstore.similarity_search_batch(queries, k=k)
+        return [self.vectorstore.similarity_search(q, k=k) for q in queries]
+
     def query_with_scores(self, query: str, k: int = 5) -> List[tuple]:
-        """Query with similarity scores"""
+        """Query with similarity scores
+
+        Returns (document, similarity) pairs where higher is better.
+        The in-memory store already reports cosine similarity; legacy
+        Chroma stores report a distance whose meaning depends on the
+        collection's actual hnsw space, so those are converted
+        accordingly.
+        """
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized")
 
         results = self.vectorstore.similarity_search_with_score(query, k=k)
+        if isinstance(self.vectorstore, Chroma):
+            return _chroma_scores_to_similarity(self.vectorstore, results)
         return results
 
     def _get_medical_documents(self) -> List[Document]:
@@ -470,13 +780,22 @@ If Not Meeting Goals:
         if self.vectorstore is None:
             raise ValueError("Vector store not initialized")
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-        )
-
-        splits = text_splitter.split_documents(documents)
-        self.vectorstore.add_documents(splits)
+        splits = _MED_SPLITTER.split_documents(documents)
+        _add_in_batches(self.vectorstore, splits)
+
+        # Keep the on-disk numpy store in sync so the additions survive
+        # the next load_existing_vectorstore
+        if isinstance(self.vectorstore, InMemoryMedicalStore):
+            try:
+                np.save(self._vectors_path, self.vectorstore.vectors)
+                with open(self._docs_path, 'wb') as f:
+                    pickle.dump(
+                        [(doc.page_content, doc.metadata)
+                         for doc in self.vectorstore.documents],
+                        f, protocol=pickle.HIGHEST_PROTOCOL
+                    )
+            except OSError:
+                pass
 
         print(f"Added {len(splits)} document chunks to vector store")
 
@@ -488,14 +807,37 @@ def get_medical_context(query: str, rag_system: MedicalKnowledgeRAG, k: int = 3)
     Returns formatted string to include in agent context
     """
     results = rag_system.query_medical_knowledge(query, k=k)
+    return _format_medical_context(results, rag_system)
+
+
+def get_medical_context_batch(queries: List[str], rag_system: MedicalKnowledgeRAG, k: int = 3) -> List[str]:
+    """
+    Get medical context for several queries in one batched retrieval
+    Returns one formatted context string per query, in order
+    """
+    batches = rag_system.query_medical_knowledge_batch(list(queries), k=k)
+    return [_format_medical_context(results, rag_system) for results in batches]
+
 
+def _format_medical_context(results: List[Document], rag_system: MedicalKnowledgeRAG) -> str:
+    """Format retrieved chunks into the agent-facing context string"""
     if not results:
         return "No relevant medical information found."
 
+    # Retrieval matched small child chunks; expand each to its parent
+    # and deduplicate so overlapping children don't repeat context
+    seen = set()
     context = "Relevant Medical Knowledge:\n\n"
-    for i, doc in enumerate(results, 1):
+    i = 0
+    for doc in results:
+        content = rag_system.get_parent_content(doc)
+        key = doc.metadata.get("parent_id", content)
+        if key in seen:
+            continue
+        seen.add(key)
+        i += 1
         context += f"Source {i} ({doc.metadata.get('source', 'Unknown')}):\n"
-        context += doc.page_content + "\n\n"
+        context += content + "\n\n"
 
     return context
 
@@ -0,0 +1,180 @@
+"""
+ONNX-Accelerated MiniLM Embeddings
+Wraps an ONNX Runtime export of all-MiniLM-L6-v2 behind the LangChain
+Embeddings interface so Chroma consumes it transparently; ONNX Runtime
+runs the forward pass 2-4x faster than eager PyTorch on CPU with no
+accuracy loss. Requires the optional `optimum[onnxruntime]` package —
+callers should fall back to HuggingFaceEmbeddings when it is missing.
+"""
+
+import functools
+import itertools
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class OptimumMiniLMEmbeddings(Embeddings):
+    """MiniLM embeddings served by ONNX Runtime
+
+    The exported model and tokenizer load lazily on first use, so
+    constructing the embedder is free. Embeddings are mean-pooled over
+    the attention mask and L2-normalized, matching what
+    sentence-transformers produces for the same model.
+    """
+
+    def __init__(self, model_name: str = _MODEL_NAME,
+                 max_length: int = 256, batch_size: int = 64,
+                 quantized: bool = True, embedding_dim: int = None):
+        self.model_name = model_name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        # Truncating MiniLM's 384-d output (e.g. to 128) and
+        # renormalizing keeps most of the similarity signal for coarse
+        # matching while shrinking index memory and inner-product cost;
+        # None keeps the full dimensionality
+        self.embedding_dim = embedding_dim
+        # Dynamic INT8 quantization halves model memory and roughly
+        # doubles matmul throughput on VNNI-capable CPUs with negligible
+        # retrieval recall loss; set False to validate against FP32
+        self.quantized = quantized
+        self._model = None
+        self._tokenizer = None
+
+    def _load(self):
+        """Export/load the ONNX model and tokenizer on first use"""
+        if self._model is not None:
+            return
+
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        print("Loading ONNX MiniLM model...")
+        model = ORTModelForFeatureExtraction.from_pretrained(
+            self.model_name, export=True, provider="CPUExecutionProvider"
+        )
+        if self.quantized:
+            try:
+                model = self._quantize(model)
+            except Exception as e:
+                print(f"[WARNING] INT8 quantization failed ({e}), using FP32")
+        self._model = model
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+
+    def _quantize(self, model):
+        """Return a dynamically INT8-quantized copy of the ONNX model
+
+        The quantized graph is saved next to the repo and reused on
+        subsequent runs, so quantization is a one-time cost.
+        """
+        from optimum.onnxruntime import (
+            ORTModelForFeatureExtraction, ORTQuantizer
+        )
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        import os
+
+        save_dir = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)), ".minilm-int8"
+        )
+        if not os.path.isdir(save_dir):
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=save_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(
+                    is_static=False, per_channel=True
+                )
+            )
+        return ORTModelForFeatureExtraction.from_pretrained(
+            save_dir, provider="CPUExecutionProvider"
+        )
+
+    def _encode_batch(self, texts: List[str]):
+        import torch
+        import torch.nn.functional as F
+
+        inputs = self._tokenizer(
+            texts, padding=True, truncation=True,
+            max_length=self.max_length, return_tensors="pt"
+        )
+        outputs = self._model(**inputs)
+
+        # Mean-pool token states over the attention mask, then normalize
+        mask = inputs["attention_mask"].unsqueeze(-1).float()
+        summed = (outputs.last_hidden_state * mask).sum(dim=1)
+        pooled = summed / mask.sum(dim=1).clamp(min=1e-9)
+        pooled = F.normalize(pooled, p=2, dim=1)
+        if self.embedding_dim and pooled.shape[1] > self.embedding_dim:
+            pooled = F.normalize(pooled[:, :self.embedding_dim], p=2, dim=1)
+        return pooled.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._load()
+        embeddings = []
+        text_iter = iter(texts)
+        while True:
+            batch = list(itertools.islice(text_iter, self.batch_size))
+            if not batch:
+                break
+            embeddings.extend(self._encode_batch(batch))
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def accelerate_cpu_model(model):
+    """Apply Intel Extension for PyTorch bf16 optimization when present
+
+    On AMX-capable CPUs (Sapphire Rapids and later) ipex rewrites the
+    transformer's matmuls to bf16 tile instructions; elsewhere — or when
+    ipex is not installed — the model is returned unchanged.
+    """
+    try:
+        import intel_extension_for_pytorch as ipex
+        import torch
+    except ImportError:
+        return model
+    try:
+        return ipex.optimize(model.eval(), dtype=torch.bfloat16, inplace=True)
+    except Exception as e:
+        print(f"[WARNING] ipex optimization failed ({e}), using stock model")
+        return model
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Wrap an embedder with an LRU cache over embed_query
+
+    Agent loops re-ask identical (or identically-worded) queries; a hit
+    skips the whole MiniLM forward pass. Vectors are cached as tuples
+    for hashability and converted back to lists on the way out.
+    Document embedding passes through uncached.
+    """
+
+    def __init__(self, base: Embeddings, maxsize: int = 1024):
+        self.base = base
+        self._cached = functools.lru_cache(maxsize=maxsize)(self._embed)
+
+    def _embed(self, text: str) -> tuple:
+        return tuple(self.base.embed_query(text))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return list(self._cached(text))
+
+    @property
+    def client(self):
+        """Expose the wrapped backend's raw model, if any"""
+        return getattr(self.base, "client", None)
+
+
+def get_onnx_embeddings(**kwargs):
+    """Return an ONNX embedder, or None when optimum is not installed"""
+    try:
+        import optimum.onnxruntime  # noqa: F401
+    except ImportError:
+        return None
+    return OptimumMiniLMEmbeddings(**kwargs)
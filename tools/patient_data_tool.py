@@ -4,10 +4,11 @@ Loads patient data from the NFHS dataset (9,730 records)
 Columns: BMI, Weight_kg, Height_cm, BMI_Category, Age, State, Urban_Rural, Wealth_Index
 """
 
+import numpy as np
 import pandas as pd
 import os
+import sys
 from typing import Dict, Optional, List
-import random
 
 
 # State mapping (based on NFHS-5 state codes)
@@ -36,16 +37,62 @@ WEALTH_MAPPING = {
     5: "Richest"
 }
 
+# Intern the label strings: every formatted patient dict then shares
+# one copy per distinct label (instead of duplicating "Urban",
+# "Richest", ... across thousands of results) and equality checks
+# short-circuit on pointer identity. BMI_Category gets the same
+# sharing from its category dtype.
+STATE_MAPPING = {code: sys.intern(name) for code, name in STATE_MAPPING.items()}
+RESIDENCE_MAPPING = {code: sys.intern(name) for code, name in RESIDENCE_MAPPING.items()}
+WEALTH_MAPPING = {code: sys.intern(name) for code, name in WEALTH_MAPPING.items()}
+
+# Reverse lookups for case-insensitive name -> code resolution; a dict
+# hit replaces the linear scans over the mapping items
+_STATE_NAME_TO_CODE = {name.lower(): code for code, name in STATE_MAPPING.items()}
+_WEALTH_NAME_TO_CODE = {name.lower(): code for code, name in WEALTH_MAPPING.items()}
+
+# Context strings shared by the per-row and vectorized formatting paths
+_DIET_RURAL = "Traditional Indian diet with locally grown crops, rice/wheat based meals"
+_DIET_URBAN = "Urban diet with mix of traditional and modern foods, increased processed food access"
+_ACTIVITY_RURAL = "Moderate to high physical labor in agriculture or manual work"
+_ACTIVITY_AFFLUENT = "Sedentary office work, limited physical activity, gym access available"
+_ACTIVITY_DEFAULT = "Mix of manual and sedentary work, limited structured exercise"
+
+# Precomputed context tables: there are only a handful of distinct
+# context strings, so per-row selection is a dict hit rather than a
+# chain of comparisons
+_DIET_BY_RESIDENCE = {"Rural": _DIET_RURAL}
+_ACTIVITY_CONTEXT = {
+    (res, wealth): (_ACTIVITY_RURAL if res == "Rural"
+                    else _ACTIVITY_AFFLUENT if wealth in ("Richest", "Richer")
+                    else _ACTIVITY_DEFAULT)
+    for res in ("Urban", "Rural", "Unknown")
+    for wealth in (*WEALTH_MAPPING.values(), "Unknown")
+}
+
 
 class PatientDataLoader:
     """Loads and manages patient data from NFHS dataset"""
 
-    def __init__(self, data_path: Optional[str] = None):
+    # Explicit narrow schema for the CSV path: skips pandas' per-column
+    # type inference and cuts the frame's working set ~8x versus the
+    # inferred int64/float64/object dtypes (codes all fit in a byte,
+    # ages in NFHS are 15-49)
+    _CSV_DTYPES = {
+        'State': 'uint8', 'Urban_Rural': 'uint8', 'Wealth_Index': 'uint8',
+        'Age': 'uint8', 'BMI': 'float32', 'Height_cm': 'float32',
+        'Weight_kg': 'float32', 'BMI_Category': 'category',
+    }
+
+    def __init__(self, data_path: Optional[str] = None, verbose: bool = False):
         """
         Initialize the patient data loader
 
         Args:
             data_path: Path to the CSV file. If None, uses default location.
+            verbose: Print load progress. Off by default so hot-reload
+                     scenarios (Streamlit, notebooks) don't re-print on
+                     every import.
         """
         if data_path is None:
             # Default path relative to project root
@@ -53,19 +100,77 @@ class PatientDataLoader:
             data_path = os.path.join(project_root, 'data', 'indian_obesity_data_clean.csv')
 
         self.data_path = data_path
+        self.verbose = verbose
         self.df = None
+        self._stats = None
+        # One Generator reused for all sampling — df.sample and the
+        # legacy np.random functions spin up fresh RandomState machinery
+        # per call
+        self._rng = np.random.default_rng()
         self.load_data()
 
     def load_data(self):
-        """Load the CSV data into memory"""
+        """Load the dataset into memory, preferring the Parquet sidecar
+
+        `python scripts/convert_csv_to_parquet.py` produces a Parquet
+        copy that memory-maps and loads several times faster than
+        re-parsing the CSV; when it (or pyarrow) is missing the loader
+        falls back to the CSV transparently.
+        """
+        self._stats = None  # reloading invalidates the cached stats
+        parquet_path = os.path.splitext(self.data_path)[0] + '.parquet'
         try:
-            self.df = pd.read_csv(self.data_path)
-            print(f"[OK] Loaded {len(self.df):,} patient records from NFHS dataset")
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"Data file not found at {self.data_path}. "
-                "Please ensure indian_obesity_data_clean.csv is in the data/ directory."
-            )
+            import pyarrow.parquet as pq
+            self.df = pq.read_table(parquet_path, memory_map=True).to_pandas()
+            if self.verbose:
+                print(f"[OK] Loaded {len(self.df):,} patient records from NFHS dataset (Parquet)")
+        except (ImportError, FileNotFoundError, OSError):
+            try:
+                # usecols pins the expected schema (extra columns in a
+                # regenerated export are ignored) and na_filter=False
+                # skips per-value NaN detection — the clean dataset has
+                # no missing values
+                self.df = pd.read_csv(
+                    self.data_path, usecols=list(self._CSV_DTYPES),
+                    dtype=self._CSV_DTYPES, na_filter=False
+                )
+                if self.verbose:
+                    print(f"[OK] Loaded {len(self.df):,} patient records from NFHS dataset")
+                # Write the Parquet sidecar now so every later loader
+                # (other processes included, via the shared page cache)
+                # takes the memory-mapped path instead of re-parsing
+                try:
+                    self.df.to_parquet(parquet_path)
+                except (ImportError, OSError):
+                    pass
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    f"Data file not found at {self.data_path}. "
+                    "Please ensure indian_obesity_data_clean.csv is in the data/ directory."
+                )
+
+        # Pre-stringify the patient ids in one vectorized pass (a
+        # Parquet sidecar written by a previous run already carries the
+        # column) so formatting never interpolates per row
+        if 'patient_id' not in self.df.columns:
+            self.df['patient_id'] = 'NFHS_' + self.df.index.astype(str)
+
+        # Dictionary-encoded categoricals shrink the low-cardinality
+        # columns ~3x and speed up the groupby below
+        for col in ('State', 'Urban_Rural', 'BMI_Category', 'Wealth_Index'):
+            if col in self.df.columns:
+                self.df[col] = self.df[col].astype('category')
+
+        # Pre-index rows by the full criteria tuple so fully-specified
+        # lookups are a dict access instead of four boolean scans
+        self._by_criteria = self.df.groupby(
+            ['State', 'Urban_Rural', 'BMI_Category', 'Wealth_Index'],
+            sort=False, observed=True
+        ).indices
+        # Canonical spellings for case-insensitive lookups
+        self._bmi_categories = {
+            c.lower(): c for c in self.df['BMI_Category'].dropna().unique()
+        }
 
     def get_random_patient(self) -> Dict:
         """
@@ -77,8 +182,9 @@ class PatientDataLoader:
         if self.df is None:
             raise ValueError("Data not loaded")
 
-        patient_row = self.df.sample(n=1).iloc[0]
-        return self._format_patient_data(patient_row)
+        # Picking an integer position avoids df.sample's temporary
+        # one-row frame and index rebuild
+        return self.get_patient_by_index(int(self._rng.integers(len(self.df))))
 
     def get_patient_by_index(self, index: int) -> Dict:
         """
@@ -121,39 +227,92 @@ class PatientDataLoader:
         if self.df is None:
             raise ValueError("Data not loaded")
 
-        filtered_df = self.df.copy()
-
-        if state:
-            # Find state code
-            state_code = None
-            for code, name in STATE_MAPPING.items():
-                if name.lower() == state.lower():
-                    state_code = code
-                    break
-            if state_code:
-                filtered_df = filtered_df[filtered_df['State'] == state_code]
-
-        if residence_type:
-            residence_code = 1 if residence_type.lower() == "urban" else 2
-            filtered_df = filtered_df[filtered_df['Urban_Rural'] == residence_code]
-
-        if bmi_category:
-            filtered_df = filtered_df[filtered_df['BMI_Category'].str.lower() == bmi_category.lower()]
+        # No criteria at all: sample positions directly, skipping the
+        # bucket machinery entirely
+        if not (state or residence_type or bmi_category or wealth_index):
+            n = min(limit, len(self.df))
+            positions = self._rng.choice(len(self.df), size=n, replace=False)
+            return self._format_patients_frame(self.df.iloc[positions])
+
+        state_code = _STATE_NAME_TO_CODE.get(state.lower()) if state else None
+        residence_code = (1 if residence_type.lower() == "urban" else 2) if residence_type else None
+        canonical = self._bmi_categories.get(bmi_category.lower()) if bmi_category else None
+        wealth_code = _WEALTH_NAME_TO_CODE.get(wealth_index.lower()) if wealth_index else None
+        if bmi_category and canonical is None:
+            return []
+
+        # Fast path: all four criteria given -> O(1) lookup in the
+        # composite index built at load time
+        if state_code and residence_code and canonical and wealth_code:
+            indices = self._by_criteria.get(
+                (state_code, residence_code, canonical, wealth_code)
+            )
+            if indices is None:
+                return []
+        else:
+            # Partial criteria: union the matching buckets of the same
+            # composite index — with at most a few dozen occupied
+            # buckets this beats a boolean scan over all rows
+            wanted = [
+                idx for key, idx in self._by_criteria.items()
+                if (state_code is None or key[0] == state_code)
+                and (residence_code is None or key[1] == residence_code)
+                and (canonical is None or key[2] == canonical)
+                and (wealth_code is None or key[3] == wealth_code)
+            ]
+            if not wanted:
+                return []
+            indices = np.concatenate(wanted) if len(wanted) > 1 else wanted[0]
+
+        if len(indices) > limit:
+            indices = self._rng.choice(indices, size=limit, replace=False)
+
+        return self._format_patients_frame(self.df.iloc[indices])
+
+    def _format_patients_frame(self, df: pd.DataFrame) -> List[Dict]:
+        """
+        Format a whole frame of patients in one vectorized pass
 
-        if wealth_index:
-            wealth_code = None
-            for code, name in WEALTH_MAPPING.items():
-                if name.lower() == wealth_index.lower():
-                    wealth_code = code
-                    break
-            if wealth_code:
-                filtered_df = filtered_df[filtered_df['Wealth_Index'] == wealth_code]
+        Column-level map/concat/np.select keeps the per-row work at C
+        level instead of formatting each patient in Python; the final
+        to_dict(orient='records') boxes values to native Python types
+        in one call. Used by multi-row queries; single-row accessors
+        keep the pd.Series formatter where overhead doesn't matter.
 
-        # Sample up to limit records
-        if len(filtered_df) > limit:
-            filtered_df = filtered_df.sample(n=limit)
+        Args:
+            df: Slice of self.df to format
 
-        return [self._format_patient_data(row) for _, row in filtered_df.iterrows()]
+        Returns:
+            List of formatted patient dictionaries
+        """
+        state_name = df['State'].map(STATE_MAPPING).astype(object).fillna("Unknown")
+        residence_type = df['Urban_Rural'].map(RESIDENCE_MAPPING).astype(object).fillna("Unknown")
+        wealth_index = df['Wealth_Index'].map(WEALTH_MAPPING).astype(object).fillna("Unknown")
+
+        rural = residence_type.to_numpy() == "Rural"
+        affluent = wealth_index.isin(("Richest", "Richer")).to_numpy()
+
+        out = pd.DataFrame({
+            "patient_id": df['patient_id'],
+            "age": df['Age'].astype(int),
+            # Round away float32 representation noise (35.3 stored as
+            # 35.29999923...) so output matches the source values
+            "height_cm": df['Height_cm'].astype(float).round(2),
+            "weight_kg": df['Weight_kg'].astype(float).round(2),
+            "bmi": df['BMI'].astype(float).round(2),
+            "bmi_category": df['BMI_Category'].astype(object),
+            "state": state_name,
+            "residence_type": residence_type,
+            "wealth_index": wealth_index,
+            "location_context": residence_type + " area in " + state_name,
+            "socioeconomic_status": wealth_index,
+            "dietary_context": np.where(rural, _DIET_RURAL, _DIET_URBAN),
+            "physical_activity_context": np.select(
+                [rural, affluent], [_ACTIVITY_RURAL, _ACTIVITY_AFFLUENT],
+                default=_ACTIVITY_DEFAULT
+            ),
+        })
+        return out.to_dict(orient='records')
 
     def _format_patient_data(self, row: pd.Series) -> Dict:
         """
@@ -178,11 +337,13 @@ class PatientDataLoader:
         wealth_index = WEALTH_MAPPING.get(wealth_code, "Unknown")
 
         patient_data = {
-            "patient_id": f"NFHS_{row.name}",
+            "patient_id": row['patient_id'],
             "age": int(row['Age']) if pd.notna(row['Age']) else None,
-            "height_cm": float(row['Height_cm']) if pd.notna(row['Height_cm']) else None,
-            "weight_kg": float(row['Weight_kg']) if pd.notna(row['Weight_kg']) else None,
-            "bmi": float(row['BMI']) if pd.notna(row['BMI']) else None,
+            # round() strips float32 representation noise (35.3 stored
+            # as 35.29999923...) before the value reaches prompts/UI
+            "height_cm": round(float(row['Height_cm']), 2) if pd.notna(row['Height_cm']) else None,
+            "weight_kg": round(float(row['Weight_kg']), 2) if pd.notna(row['Weight_kg']) else None,
+            "bmi": round(float(row['BMI']), 2) if pd.notna(row['BMI']) else None,
             "bmi_category": row['BMI_Category'] if pd.notna(row['BMI_Category']) else "Unknown",
             "state": state_name,
             "residence_type": residence_type,
@@ -201,19 +362,11 @@ class PatientDataLoader:
 
     def _get_dietary_context(self, state: str, residence: str) -> str:
         """Generate dietary context based on location"""
-        if residence == "Rural":
-            return "Traditional Indian diet with locally grown crops, rice/wheat based meals"
-        else:
-            return "Urban diet with mix of traditional and modern foods, increased processed food access"
+        return _DIET_BY_RESIDENCE.get(residence, _DIET_URBAN)
 
     def _get_activity_context(self, residence: str, wealth: str) -> str:
         """Generate activity context based on socioeconomic factors"""
-        if residence == "Rural":
-            return "Moderate to high physical labor in agriculture or manual work"
-        elif wealth in ["Richest", "Richer"]:
-            return "Sedentary office work, limited physical activity, gym access available"
-        else:
-            return "Mix of manual and sedentary work, limited structured exercise"
+        return _ACTIVITY_CONTEXT.get((residence, wealth), _ACTIVITY_DEFAULT)
 
     def get_dataset_stats(self) -> Dict:
         """
@@ -225,13 +378,20 @@ class PatientDataLoader:
         if self.df is None:
             raise ValueError("Data not loaded")
 
+        # The dataset is immutable after load_data, so stats are
+        # computed once and served from cache on repeat calls
+        if self._stats is not None:
+            return self._stats
+
+        # One aggregation pass instead of four separate reductions
+        means = self.df[['BMI', 'Age', 'Weight_kg', 'Height_cm']].mean()
         stats = {
             "total_records": len(self.df),
             "bmi_categories": self.df['BMI_Category'].value_counts().to_dict(),
-            "average_bmi": float(self.df['BMI'].mean()),
-            "average_age": float(self.df['Age'].mean()),
-            "average_weight": float(self.df['Weight_kg'].mean()),
-            "average_height": float(self.df['Height_cm'].mean()),
+            "average_bmi": float(means['BMI']),
+            "average_age": float(means['Age']),
+            "average_weight": float(means['Weight_kg']),
+            "average_height": float(means['Height_cm']),
         }
 
         # Add state distribution
@@ -246,6 +406,7 @@ class PatientDataLoader:
         wealth_counts = self.df['Wealth_Index'].value_counts().to_dict()
         stats["wealth_distribution"] = {WEALTH_MAPPING.get(k, f"Unknown_{k}"): v for k, v in wealth_counts.items()}
 
+        self._stats = stats
         return stats
 
 
@@ -277,7 +438,7 @@ if __name__ == "__main__":
     print("TESTING PATIENT DATA LOADER")
     print("="*60 + "\n")
 
-    loader = PatientDataLoader()
+    loader = PatientDataLoader(verbose=True)
 
     # Show dataset stats
     print("Dataset Statistics:")
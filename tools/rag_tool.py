@@ -5,44 +5,78 @@ Provides retrieval-augmented generation capabilities using medical knowledge and
 
 from crewai.tools import tool
 from typing import Optional
+import functools
+import re
 import sys
 import os
+import threading
 
 # Add parent directory to path to import other tools
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from medical_knowledge_rag import MedicalKnowledgeRAG, get_medical_context
+from medical_knowledge_rag import (
+    MedicalKnowledgeRAG, get_medical_context, get_medical_context_batch
+)
 from patient_data_indexer import PatientDataIndexer, get_similar_patient_context
 
 
-# Initialize RAG systems (singleton pattern for efficiency)
+# Initialize RAG systems (singleton pattern for efficiency).
+# Double-checked locking keeps concurrent agent tool calls from
+# racing to build (and briefly double-holding) the expensive vector
+# stores; the globals are only published fully initialized.
+_init_lock = threading.Lock()
 _medical_rag = None
 _patient_indexer = None
 
 
-def get_medical_rag():
-    """Get or create medical knowledge RAG instance"""
+def get_medical_rag(verbose: bool = False):
+    """Get or create medical knowledge RAG instance (thread-safe)"""
     global _medical_rag
     if _medical_rag is None:
-        _medical_rag = MedicalKnowledgeRAG()
-        try:
-            _medical_rag.load_existing_vectorstore()
-            print("[RAG] Loaded existing medical knowledge vector store")
-        except FileNotFoundError:
-            print("[RAG] Creating new medical knowledge vector store...")
-            _medical_rag.create_medical_knowledge_base()
+        with _init_lock:
+            if _medical_rag is None:
+                rag = MedicalKnowledgeRAG()
+                try:
+                    rag.load_existing_vectorstore()
+                    if verbose:
+                        print("[RAG] Loaded existing medical knowledge vector store")
+                except FileNotFoundError:
+                    if verbose:
+                        print("[RAG] Creating new medical knowledge vector store...")
+                    rag.create_medical_knowledge_base()
+                _medical_rag = rag
     return _medical_rag
 
 
-def get_patient_indexer():
-    """Get or create patient data indexer instance"""
+def get_patient_indexer(verbose: bool = False):
+    """Get or create patient data indexer instance (thread-safe)"""
     global _patient_indexer
     if _patient_indexer is None:
-        _patient_indexer = PatientDataIndexer(csv_path="data/indian_obesity_data_clean.csv")
-        print("[RAG] Initialized patient data indexer")
+        with _init_lock:
+            if _patient_indexer is None:
+                _patient_indexer = PatientDataIndexer(csv_path="data/indian_obesity_data_clean.csv")
+                if verbose:
+                    print("[RAG] Initialized patient data indexer")
     return _patient_indexer
 
 
+def _normalize_query(query: str) -> str:
+    """Canonicalize a query so trivial rephrasings share a cache entry"""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_medical_context(query: str, k: int) -> str:
+    """Retrieve medical context, memoized on the normalized query
+
+    Agent loops frequently re-ask the same question; a hit skips the
+    embedding forward pass and vector search entirely. The static
+    knowledge base never changes within a process, so entries stay
+    valid for its lifetime.
+    """
+    return get_medical_context(query, get_medical_rag(), k=k)
+
+
 @tool("Query Medical Knowledge")
 def query_medical_knowledge(query: str) -> str:
     """
@@ -70,9 +104,41 @@ def query_medical_knowledge(query: str) -> str:
         - "Exercise guidelines for sedentary patients"
     """
     try:
+        return _cached_medical_context(_normalize_query(query), k=3)
+    except Exception as e:
+        return f"Error retrieving medical knowledge: {str(e)}"
+
+
+@tool("Query Medical Knowledge (Multiple Questions)")
+def query_medical_knowledge_batch(queries: str) -> str:
+    """
+    Query the medical knowledge base with several questions at once.
+
+    Prefer this over repeated single queries when you already know the
+    questions you need answered — all queries are embedded and searched
+    in one batched pass, which is much faster than asking one at a time.
+
+    Args:
+        queries: The questions to answer, one per line
+
+    Returns:
+        Relevant medical knowledge for each question, in the same order
+
+    Example:
+        "What are the WHO guidelines for obesity treatment?
+        Which medications are recommended for BMI 32?
+        What lab tests should be ordered for an obese patient?"
+    """
+    try:
+        query_list = [q.strip() for q in queries.splitlines() if q.strip()]
+        if not query_list:
+            return "No queries provided."
         rag = get_medical_rag()
-        context = get_medical_context(query, rag, k=3)
-        return context
+        contexts = get_medical_context_batch(query_list, rag, k=3)
+        return "\n\n".join(
+            f"Query {i}: {query}\n{context}"
+            for i, (query, context) in enumerate(zip(query_list, contexts), 1)
+        )
     except Exception as e:
         return f"Error retrieving medical knowledge: {str(e)}"
 
@@ -133,9 +199,7 @@ def get_treatment_guidelines(condition: str, patient_context: str = "") -> str:
         else:
             query = condition
 
-        rag = get_medical_rag()
-        context = get_medical_context(query, rag, k=4)
-        return context
+        return _cached_medical_context(_normalize_query(query), k=4)
     except Exception as e:
         return f"Error retrieving treatment guidelines: {str(e)}"
 
@@ -163,13 +227,8 @@ def search_indian_health_data(query: str) -> str:
         - "Cultural considerations for obesity treatment in India"
     """
     try:
-        rag = get_medical_rag()
-
         # Add India-specific context to query
-        enhanced_query = f"India specific: {query}"
-        context = get_medical_context(enhanced_query, rag, k=3)
-
-        return context
+        return _cached_medical_context(_normalize_query(f"India specific: {query}"), k=3)
     except Exception as e:
         return f"Error searching Indian health data: {str(e)}"
 
@@ -177,6 +236,7 @@ def search_indian_health_data(query: str) -> str:
 # Export all tools as a list for easy import
 rag_tools = [
     query_medical_knowledge,
+    query_medical_knowledge_batch,
     find_similar_patients,
     get_treatment_guidelines,
     search_indian_health_data
@@ -0,0 +1,195 @@
+"""
+Semantic Treatment-Plan Cache
+Two-tier cache for crew results: exact hash match first, then embedding
+similarity over a short patient description, so near-identical patients
+(same age band, BMI, state, lifestyle) reuse plans instead of paying for
+five LLM calls again
+"""
+
+import hashlib
+import json
+import sys
+import threading
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Features that determine plan content; volatile identifiers are excluded
+KEY_FIELDS = (
+    'age', 'gender', 'bmi', 'bmi_category', 'state', 'residence_type',
+    'wealth_index', 'dietary_preference', 'physical_activity',
+    'daily_steps', 'smoking_status', 'alcohol_consumption'
+)
+
+# Categorical fields that change what is clinically safe to recommend.
+# Similarity must never bridge these: a one-token difference ("smoking
+# Never" vs "smoking Current Smoker") still embeds above any usable
+# threshold when the rest of the description is identical, so L2 hits
+# are restricted to entries where all of them match exactly.
+SAFETY_FIELDS = (
+    'gender', 'bmi_category', 'dietary_preference',
+    'smoking_status', 'alcohol_consumption'
+)
+
+
+class SemanticPlanCache:
+    """
+    L1: exact SHA-256 match on the key features
+    L2: cosine similarity >= threshold over the numeric/demographic
+        features, gated on exact equality of the SAFETY_FIELDS
+
+    The embedder is loaded lazily on first use, reusing the model the
+    RAG tools already hold when one is initialized (avoiding a second
+    ~90MB copy) and loading its own sentence-transformers instance
+    otherwise; if neither works the cache degrades to exact matching.
+    """
+
+    def __init__(self, similarity_threshold=0.95, max_entries=256,
+                 verbose=False):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.verbose = verbose
+        self._exact = {}
+        self._entries = []  # (embedding, key, safety, result)
+        self._model = None
+        self._model_failed = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(patient_data):
+        """Exact-match key over the plan-determining features"""
+        payload = {k: patient_data.get(k) for k in KEY_FIELDS}
+        if orjson is not None:
+            canonical = orjson.dumps(
+                payload, option=orjson.OPT_SORT_KEYS, default=str
+            )
+        else:
+            canonical = json.dumps(
+                payload, sort_keys=True, default=str
+            ).encode('utf-8')
+        return hashlib.sha256(canonical).hexdigest()
+
+    @staticmethod
+    def _safety(patient_data):
+        """Exact-equality gate for L2: the clinically decisive fields"""
+        return tuple(patient_data.get(k) for k in SAFETY_FIELDS)
+
+    @staticmethod
+    def _describe(patient_data):
+        """One-line description embedded for similarity matching
+
+        Only the numeric/demographic features; the categorical safety
+        fields are matched exactly via _safety instead of fuzzily.
+        """
+        return (
+            f"{patient_data.get('age')} year old, "
+            f"BMI {patient_data.get('bmi')}, "
+            f"{patient_data.get('residence_type')} {patient_data.get('state')}, "
+            f"wealth {patient_data.get('wealth_index')}, "
+            f"activity {patient_data.get('physical_activity')}, "
+            f"steps {patient_data.get('daily_steps')}"
+        )
+
+    @staticmethod
+    def _shared_embedder():
+        """Return an embedder the RAG tools already loaded, if any
+
+        Only inspects sys.modules — never imports or triggers a lazy
+        load itself — so the cache rides along with an existing model
+        but never forces one into memory.
+        """
+        rag_tool = (sys.modules.get('tools.rag_tool')
+                    or sys.modules.get('rag_tool'))
+        if rag_tool is None:
+            return None
+        for holder in (getattr(rag_tool, '_medical_rag', None),
+                       getattr(rag_tool, '_patient_indexer', None)):
+            # embeddings is a cached_property; only reuse it when the
+            # instance has actually materialized it
+            if holder is not None and 'embeddings' in holder.__dict__:
+                return holder.embeddings
+        return None
+
+    def _embed(self, text):
+        """Embed a description, or None if no model is available"""
+        if self._model_failed:
+            return None
+        if self._model is None:
+            self._model = self._shared_embedder()
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer('all-MiniLM-L6-v2')
+            except Exception as e:
+                print(f"[WARNING] Semantic cache falling back to exact matching: {str(e)}")
+                self._model_failed = True
+                return None
+
+        if hasattr(self._model, 'encode'):
+            return self._model.encode(text, normalize_embeddings=True)
+        # LangChain Embeddings interface (the shared RAG embedder);
+        # its backends normalize, but renormalize defensively since the
+        # dot product below assumes unit vectors
+        embedding = np.asarray(self._model.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        if norm > 0:
+            embedding = embedding / norm
+        return embedding
+
+    def get(self, patient_data):
+        """Return a cached plan for this patient, or None"""
+        key = self._key(patient_data)
+        with self._lock:
+            result = self._exact.get(key)
+        if result is not None:
+            if self.verbose:
+                print("[OK] Semantic cache: exact hit")
+            return result
+
+        embedding = self._embed(self._describe(patient_data))
+        if embedding is None:
+            return None
+
+        safety = self._safety(patient_data)
+        with self._lock:
+            entries = list(self._entries)
+        best_score = 0.0
+        best_result = None
+        for cached_embedding, _, cached_safety, cached_result in entries:
+            # Never bridge a safety field with similarity: a plan for a
+            # different smoking/alcohol/diet/gender/BMI-category profile
+            # is not a near-match, however close the embedding
+            if cached_safety != safety:
+                continue
+            # Embeddings are normalized, so the dot product is the cosine
+            score = float(embedding @ cached_embedding)
+            if score > best_score:
+                best_score = score
+                best_result = cached_result
+        if best_score >= self.similarity_threshold:
+            if self.verbose:
+                print(f"[OK] Semantic cache: similarity hit ({best_score:.3f})")
+            return best_result
+        return None
+
+    def set(self, patient_data, result):
+        """Store a generated plan under both tiers"""
+        key = self._key(patient_data)
+        embedding = self._embed(self._describe(patient_data))
+        with self._lock:
+            self._exact[key] = result
+            if embedding is not None:
+                self._entries.append(
+                    (embedding, key, self._safety(patient_data), result)
+                )
+            # Oldest-first eviction keeps both tiers bounded
+            while len(self._entries) > self.max_entries:
+                _, old_key, _, _ = self._entries.pop(0)
+                self._exact.pop(old_key, None)
+            while len(self._exact) > self.max_entries:
+                self._exact.pop(next(iter(self._exact)))
@@ -0,0 +1,70 @@
+"""
+State-Specific Food Database Loader
+Serves the regional food/dietary reference data from data/state_food_db.json
+Loaded once per process and shared via the module cache
+"""
+
+import functools
+import json
+import os
+import sys
+
+_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'data', 'state_food_db.json'
+)
+
+
+# Schema keys whose values are sequences of food names
+_SEQUENCE_KEYS = ('staples', 'typical_dishes', 'proteins', 'vegetables', 'avoid')
+
+
+def _intern_keys(entry):
+    """
+    Intern the schema and diet-preference keys of one state entry, and
+    freeze its food lists into tuples
+
+    The same handful of keys ('staples', 'Vegetarian', ...) repeats across
+    every state; interning lets dict lookups hit the identity fast path and
+    keeps a single copy of each key string resident. Tuples are smaller
+    than lists, iterate faster, and make accidental mutation of the shared
+    reference data fail loudly.
+    """
+    interned = {sys.intern(k): v for k, v in entry.items()}
+    for key in _SEQUENCE_KEYS:
+        # Intern the food names too: items like 'Lentils' recur across
+        # states and are probed against frozensets in the diet filter,
+        # where identical interned strings compare by pointer
+        interned[key] = tuple(sys.intern(s) for s in interned[key])
+    interned['recommendations'] = {
+        sys.intern(k): v for k, v in interned['recommendations'].items()
+    }
+    return interned
+
+
+@functools.lru_cache(maxsize=1)
+def _load_db():
+    """Read and parse the JSON database once"""
+    with open(_DB_PATH, 'r', encoding='utf-8') as f:
+        db = json.load(f)
+    db['states'] = {
+        sys.intern(state): _intern_keys(entry)
+        for state, entry in db['states'].items()
+    }
+    db['default'] = _intern_keys(db['default'])
+    return db
+
+
+def get_state_food_db():
+    """
+    Get the per-state food database
+
+    Returns:
+        dict: {state_name: {staples, typical_dishes, proteins, vegetables,
+               avoid, recommendations}}
+    """
+    return _load_db()['states']
+
+
+def get_default_state_data():
+    """Get the fallback entry used for states not in the database"""
+    return _load_db()['default']